@@ -60,9 +60,10 @@ class EnhancedMultiBankProcessor:
     
     def add_bank_statement(self, filepath: str, statement_id: str,
                           card_types: Optional[List[str]] = None,
-                          card_type_override: Optional[str] = None):
-        """Add a bank statement file to process."""
-        bank_df = preprocess_bank_statement(filepath)
+                          card_type_override: Optional[str] = None,
+                          bank_df: Optional[pd.DataFrame] = None):
+        """Add a bank statement file to process (bank_df: already preprocessed copy of filepath)."""
+        bank_df = bank_df.copy() if bank_df is not None else preprocess_bank_statement(filepath)
         bank_df['Bank_Row_Number'] = range(2, len(bank_df) + 2)
         bank_df['Statement_ID'] = statement_id
         
@@ -263,7 +264,9 @@ def process_with_enhanced_multi_bank(
     enable_discover_backward_matching: bool = True,  # Easy toggle
     discover_backward_days: int = 3,
     discover_forward_days: int = 3,
-    verbose: bool = False):
+    verbose: bool = False,
+    bank_df: Optional[pd.DataFrame] = None,
+    fast_excel: bool = False):
     """
     Enhanced multi-bank processing with configurable Discover date matching.
     
@@ -271,6 +274,8 @@ def process_with_enhanced_multi_bank(
         enable_discover_backward_matching: Set to False to disable backward date matching for Discover
         discover_backward_days: How many days backward to look for Discover transactions
         discover_forward_days: How many days forward to look for Discover transactions
+        bank_df: Already preprocessed main bank statement, to skip re-reading main_bank_statement_path
+        fast_excel: Write the highlighted card summary through a write-only workbook
     """
     print("=== ENHANCED MULTI-BANK TRANSACTION MATCHING ===\n")
     
@@ -289,7 +294,8 @@ def process_with_enhanced_multi_bank(
         filepath=main_bank_statement_path,
         statement_id='main',
         card_types=['Visa', 'Master Card', 'Amex', 'Debit Visa', 
-                   'Debit Master', 'Other Cards', 'Cash', 'Check']
+                   'Debit Master', 'Other Cards', 'Cash', 'Check'],
+        bank_df=bank_df
     )
     
     # Add Discover bank statement
@@ -341,7 +347,8 @@ def process_with_enhanced_multi_bank(
         card_summary_path=card_summary_path,
         matched_dates_and_types=matched_dates_and_types,
         output_path=f"{output_dir}/card_summary_enhanced_highlighted.xlsx",
-        unmatched_info=unmatched_info
+        unmatched_info=unmatched_info,
+        fast_excel=fast_excel
     )
     
     # Print summary
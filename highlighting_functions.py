@@ -1,10 +1,25 @@
 import pandas as pd
-from openpyxl import load_workbook
+import numpy as np
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Font
 from openpyxl.utils import get_column_letter
 from openpyxl.comments import Comment
 import shutil
 
+# Currency formatter shared by all comment builders
+format_money = '${:,.2f}'.format
+
+# Shared fonts for the summary highlighters, created once and reused for every cell.
+# Assigning a font keeps the cell's own number format, unlike assigning a NamedStyle.
+GREEN_FONT = Font(color='006400')   # Dark green for matched
+RED_FONT = Font(color='DC143C')     # Crimson red for unmatched
+YELLOW_FONT = Font(color='B8860B')  # Dark goldenrod for special cases
+LABEL_FONT = Font(bold=True)
+POSITIVE_DIFF_FONT = Font(color='0000FF', bold=True)  # Blue for positive
+NEGATIVE_DIFF_FONT = Font(color='FF0000', bold=True)  # Red for negative
+ZERO_DIFF_FONT = Font(color='008000', bold=True)      # Green for zero
+
 def create_highlighted_bank_statement(bank_statement_path: str, matched_bank_rows: set, 
                                     output_path: str = 'bank_statement_highlighted.xlsx',
                                     differences_by_row: dict = None,
@@ -17,7 +32,7 @@ def create_highlighted_bank_statement(bank_statement_path: str, matched_bank_row
     
     Args:
         bank_statement_path (str): Path to original bank statement CSV
-        matched_bank_rows (set): Set of row numbers that were matched (1-based Excel rows)
+        matched_bank_rows (set): Set (or integer array) of row numbers that were matched (1-based Excel rows)
         output_path (str): Output path for highlighted Excel file
         differences_by_row (dict): Optional dict mapping bank rows to difference amounts
         transaction_details (dict): Optional dict mapping bank rows to transaction details for comments
@@ -42,6 +57,11 @@ def create_highlighted_bank_statement(bank_statement_path: str, matched_bank_row
         blue_font = Font(color='0000CD')   # Medium blue for GC transactions
         yellow_font = Font(color='B8860B') # Dark goldenrod for other special cases
         
+        # Flag matched rows in a boolean array indexed by Excel row
+        matched_rows = np.fromiter(matched_bank_rows, dtype=np.int64)
+        is_matched = np.zeros(len(original_df) + 2, dtype=bool)
+        is_matched[matched_rows[(matched_rows >= 0) & (matched_rows < len(is_matched))]] = True
+        
         # Process all rows in the bank statement
         for row_idx in range(len(original_df)):
             excel_row = row_idx + 2  # +2 because Excel is 1-based and has header
@@ -52,7 +72,7 @@ def create_highlighted_bank_statement(bank_statement_path: str, matched_bank_row
                 font_color = None
                 comment_text = None
                 
-                if excel_row in matched_bank_rows:
+                if is_matched[excel_row]:
                     # Matched transaction
                     font_color = green_font
                     if transaction_details and excel_row in transaction_details:
@@ -463,12 +483,9 @@ def create_highlighted_card_summary(card_summary_path: str, matched_dates_and_ty
     
     # Find column indices for card types
     header_row = 3
-    column_mapping = {}
-    
-    for col_idx in range(1, worksheet.max_column + 1):
-        cell_value = worksheet.cell(row=header_row, column=col_idx).value
-        if cell_value:
-            column_mapping[str(cell_value).strip()] = col_idx
+    header_values = next(worksheet.iter_rows(min_row=header_row, max_row=header_row, values_only=True), ())
+    column_mapping = {str(cell_value).strip(): col_idx
+                      for col_idx, cell_value in enumerate(header_values, start=1) if cell_value}
     
     # Track statistics
     matched_cells_count = 0
@@ -569,6 +586,205 @@ def create_highlighted_card_summary(card_summary_path: str, matched_dates_and_ty
     if total_row and unmatched_bank_by_type:
         print(f"  - Total row comments added for unmatched bank transactions: {len([k for k in unmatched_bank_by_type.keys() if k in column_mapping])}")
 
+def highlight_workbook(source_path: str, output_path: str, data_df: pd.DataFrame,
+                       structure_info: dict, column_filter, decide_cell,
+                       extra_cells=None, write_only: bool = False) -> dict:
+    """
+    Write a highlighted copy of a dynamically structured summary workbook (card summary or deposit slip).
+    
+    The caller decides how each cell is colored and commented; this helper owns the shared
+    work of mapping dates to Excel rows, headers to columns, and walking the data cells.
+    
+    Args:
+        source_path (str): Path to the original Excel file
+        output_path (str): Output path for highlighted Excel file
+        data_df (pd.DataFrame): Preprocessed data rows with a 'Date' column
+        structure_info (dict): Structure info returned by the matching preprocessor
+        column_filter (callable): column_filter(header) -> True for columns that should be highlighted
+        decide_cell (callable): decide_cell(date, column, expected_amount, expected_text) -> (font, comment),
+            called for every non-zero cell; either value may be None to leave the cell untouched
+        extra_cells (callable): Optional extra_cells(column_mapping) -> {(row, col): {attribute: value}}
+            for cells outside the data rows, such as total row comments and the discrepancy row
+        write_only (bool): Stream the active sheet into a new write-only workbook instead of
+            loading, modifying and saving a full copy. Much faster on large files, but the output
+            only keeps cell values and styles - column widths, merged cells and other sheets are dropped
+        
+    Returns:
+        dict: Mapping of header names to 1-based Excel column indices
+    """
+    if write_only:
+        # Only read the source; the output is written from scratch
+        workbook = load_workbook(source_path, read_only=True)
+    else:
+        # Load the original once and save the modified workbook to output_path
+        workbook = load_workbook(source_path)
+    worksheet = workbook.active
+    if write_only:
+        # Read-only sheets trust the stored <dimension> tag, which exported files often leave stale
+        worksheet.reset_dimensions()
+    
+    # Create mapping of dates to Excel rows: data rows are the sheet rows from
+    # data_start_row onwards that were not skipped in the original
+    skip_rows = structure_info['skip_rows']
+    candidate_rows = np.arange(structure_info['data_start_row'],
+                               structure_info['data_start_row'] + len(data_df) + len(skip_rows))
+    data_rows = candidate_rows[~np.isin(candidate_rows, skip_rows)][:len(data_df)]
+    excel_row_mapping = dict(zip(data_df['Date'], (data_rows + 1).tolist()))  # +1 for 1-based Excel rows
+    
+    # Find column indices for each header
+    header_row = structure_info['header_row'] + 1  # +1 for 1-based Excel rows
+    header_values = next(worksheet.iter_rows(min_row=header_row, max_row=header_row, values_only=True), ())
+    column_mapping = {str(cell_value).strip(): col_idx
+                      for col_idx, cell_value in enumerate(header_values, start=1) if cell_value}
+    
+    active_columns = [column for column in column_mapping
+                      if column_filter(column) and column in data_df.columns]
+    
+    # Preformat every expected amount once per column instead of per commented cell
+    expected_text = {
+        column: list(map(format_money, data_df[column].to_numpy()))
+        for column in active_columns
+    }
+    
+    # Resolve tuple positions and target columns once, outside the row loop
+    date_pos = data_df.columns.get_loc('Date')
+    cell_columns = [(column, data_df.columns.get_loc(column), column_mapping[column], expected_text[column])
+                    for column in active_columns]
+    
+    # Process all data rows (not including total), collecting (row, column) -> {attribute: value}
+    # without touching the worksheet
+    updates = {}
+    for idx, row in enumerate(data_df.itertuples(index=False, name=None)):
+        date = row[date_pos]
+        excel_row = excel_row_mapping[date]
+        
+        for column, pos, col_idx, column_text in cell_columns:
+            expected_amount = row[pos]
+            if pd.notna(expected_amount) and expected_amount != 0:
+                font, comment = decide_cell(date, column, expected_amount, column_text[idx])
+                attributes = {}
+                if font is not None:
+                    attributes['font'] = font
+                if comment is not None:
+                    attributes['comment'] = comment
+                if attributes:
+                    updates[(excel_row, col_idx)] = attributes
+    
+    if extra_cells:
+        for position, attributes in extra_cells(column_mapping).items():
+            updates.setdefault(position, {}).update(attributes)
+    
+    if write_only:
+        try:
+            _write_highlighted_copy(worksheet, output_path, updates)
+        finally:
+            workbook.close()
+        return column_mapping
+    
+    # Apply all updates in a single sweep over the affected block of the sheet
+    if updates:
+        update_rows = [excel_row for excel_row, _ in updates]
+        update_cols = [col_idx for _, col_idx in updates]
+        for row_cells in worksheet.iter_rows(min_row=min(update_rows), max_row=max(update_rows),
+                                             min_col=min(update_cols), max_col=max(update_cols)):
+            for cell in row_cells:
+                attributes = updates.get((cell.row, cell.column))
+                if attributes:
+                    for name, value in attributes.items():
+                        setattr(cell, name, value)
+    
+    # Save
+    workbook.save(output_path)
+    workbook.close()
+    
+    return column_mapping
+
+def _write_highlighted_copy(source_sheet, output_path: str, updates: dict):
+    """
+    Stream a read-only sheet into a new write-only workbook, applying highlight updates on the way.
+    
+    Args:
+        source_sheet: Read-only worksheet to copy
+        output_path (str): Output path for highlighted Excel file
+        updates (dict): {(row, col): {attribute: value}} to apply, including rows past the end of the source
+    """
+    updates_by_row = {}
+    for (excel_row, col_idx), attributes in updates.items():
+        updates_by_row.setdefault(excel_row, {})[col_idx] = attributes
+    
+    output = Workbook(write_only=True)
+    output_sheet = output.create_sheet(title=source_sheet.title)
+    
+    def copy_row(excel_row, source_cells):
+        row_updates = updates_by_row.get(excel_row, {})
+        width = max([len(source_cells)] + list(row_updates))
+        cells = []
+        for col_idx in range(1, width + 1):
+            source_cell = source_cells[col_idx - 1] if col_idx <= len(source_cells) else None
+            attributes = row_updates.get(col_idx)
+            # Padding cells in read-only rows are EmptyCell objects without any style
+            has_style = getattr(source_cell, 'has_style', False)
+            value = source_cell.value if source_cell is not None else None
+            if value is None and not has_style and not attributes:
+                cells.append(None)
+                continue
+            
+            cell = WriteOnlyCell(output_sheet, value=value)
+            if has_style:
+                cell.font = source_cell.font
+                cell.fill = source_cell.fill
+                cell.border = source_cell.border
+                cell.alignment = source_cell.alignment
+                cell.protection = source_cell.protection
+                cell.number_format = source_cell.number_format
+            for name, value in (attributes or {}).items():
+                setattr(cell, name, value)
+            cells.append(cell)
+        return cells
+    
+    last_row = 0
+    for excel_row, source_cells in enumerate(source_sheet.iter_rows(), start=1):
+        output_sheet.append(copy_row(excel_row, source_cells))
+        last_row = excel_row
+    
+    # Rows past the end of the source, such as the discrepancy row below the total
+    for excel_row in range(last_row + 1, max(updates_by_row, default=last_row) + 1):
+        output_sheet.append(copy_row(excel_row, ()))
+    
+    output.save(output_path)
+
+def add_net_discrepancy_row(discrepancy_row: int, column_mapping: dict,
+                            discrepancies: dict, column_filter) -> dict:
+    """
+    Build a bold "Net Discrepancy" row with color-coded differences per column.
+    
+    Args:
+        discrepancy_row (int): 1-based Excel row for the discrepancy values
+        column_mapping (dict): Mapping of header names to 1-based Excel column indices
+        discrepancies (dict): Net difference per column header
+        column_filter (callable): column_filter(header) -> True for columns that get a value
+        
+    Returns:
+        dict: {(row, col): {attribute: value}} cell updates for highlight_workbook
+    """
+    # Add label in first column
+    cells = {(discrepancy_row, 1): {'value': "Net Discrepancy", 'font': LABEL_FONT}}
+    
+    # Add discrepancy values for each column
+    for column, col_idx in column_mapping.items():
+        if column in discrepancies and column_filter(column):
+            diff = discrepancies[column]
+            
+            # Format positive/negative with appropriate colors
+            if abs(diff) > 0.01:
+                # Color code: red for negative (bank has less), blue for positive (bank has more)
+                font = POSITIVE_DIFF_FONT if diff > 0 else NEGATIVE_DIFF_FONT
+                cells[(discrepancy_row, col_idx)] = {'value': diff, 'number_format': '$#,##0.00', 'font': font}
+            else:
+                cells[(discrepancy_row, col_idx)] = {'value': 0, 'number_format': '$#,##0.00', 'font': ZERO_DIFF_FONT}
+    
+    return cells
+
 def extract_matched_info_from_results(results: dict) -> tuple:
     """
     Extract matched bank rows and matched dates/card types from results.
@@ -620,54 +836,66 @@ def extract_matched_info_from_results(results: dict) -> tuple:
     
     return matched_bank_rows, matched_dates_and_types, differences_by_row, differences_by_date_type, unmatched_info
 
-def extract_transaction_details_for_comments(results: dict, bank_statement: pd.DataFrame) -> tuple:
+# Bank statement columns copied into comment details, with defaults for missing columns
+_BANK_DETAIL_DEFAULTS = {'Date': '', 'Description': '', 'Amount': 0, 'Card_Type': '', 'Transaction_Type': ''}
+
+def _join_bank_details(records_df: pd.DataFrame, bank_statement: pd.DataFrame) -> pd.DataFrame:
     """
-    Extract transaction details and match type information for adding comments to bank statement.
+    Join flattened per-bank-row match records to the bank statement rows they point at.
     
-    Args:
-        results (dict): Matching results from the transaction matcher
-        bank_statement (pd.DataFrame): Bank statement dataframe
-        
-    Returns:
-        tuple: (dict of transaction details by bank row, dict of match types by bank row)
+    Bank rows are 1-based Excel rows (row 2 is the first transaction) and rows outside the
+    statement are dropped. Rows keep the order they first appear in, and the last record
+    wins when a bank row appears more than once.
     """
-    transaction_details = {}
-    match_type_info = {}
-    
+    bank_details = bank_statement.reindex(columns=list(_BANK_DETAIL_DEFAULTS))
+    for column, default in _BANK_DETAIL_DEFAULTS.items():
+        if column not in bank_statement.columns:
+            bank_details[column] = default
+    bank_details.index = np.arange(2, len(bank_statement) + 2)  # +2 for header and 1-based rows
+    
+    first_seen = records_df['bank_row'].drop_duplicates()
+    records_df = records_df.drop_duplicates('bank_row', keep='last').set_index('bank_row').loc[first_seen]
+    joined = records_df.join(bank_details, how='inner')
+    return joined[bank_details.columns.tolist() + records_df.columns.tolist()]
+
+def _result_sections(results: dict, section: str):
+    """Yield (date, per-type dict) for every date result that has the given section."""
     for date, date_results in results.items():
         # Skip metadata keys that start with underscore
         if isinstance(date, str) and date.startswith('_'):
             continue
         
         # Also skip if date_results is not a dictionary with expected structure
-        if not isinstance(date_results, dict) or 'matches_by_card_type' not in date_results:
+        if not isinstance(date_results, dict) or section not in date_results:
             continue
         
-        # Process matched transactions
-        for card_type, match_info in date_results['matches_by_card_type'].items():
-            match_type = match_info.get('match_type', 'unknown')
-            
-            # Get transaction details for each matched bank row
-            for bank_row in match_info['bank_rows']:
-                # Find the transaction in the bank statement
-                if bank_row <= len(bank_statement) + 1:  # +1 for header row
-                    bank_idx = bank_row - 2  # Convert to 0-based index
-                    if 0 <= bank_idx < len(bank_statement):
-                        transaction = bank_statement.iloc[bank_idx]
-                        
-                        # Create transaction details for comment
-                        transaction_details[bank_row] = {
-                            'Date': transaction.get('Date', ''),
-                            'Description': transaction.get('Description', ''),
-                            'Amount': transaction.get('Amount', 0),
-                            'Card_Type': transaction.get('Card_Type', ''),
-                            'Transaction_Type': transaction.get('Transaction_Type', ''),
-                            'Expected_Amount': match_info.get('expected', 0),
-                            'Actual_Total': match_info.get('actual_total', 0)
-                        }
-                        
-                        # Store match type information
-                        match_type_info[bank_row] = match_type
+        yield date, date_results[section]
+
+def extract_transaction_details_for_comments(results: dict, bank_statement: pd.DataFrame) -> tuple:
+    """
+    Extract transaction details and match type information for adding comments to bank statement.
+    
+    Args:
+        results (dict): Matching results from the transaction matcher
+        bank_statement (pd.DataFrame): Bank statement dataframe
+        
+    Returns:
+        tuple: (dict of transaction details by bank row, dict of match types by bank row)
+    """
+    # Flatten the nested results into one record per matched bank row
+    matches_df = pd.DataFrame.from_records(
+        [(bank_row, match_info.get('expected', 0), match_info.get('actual_total', 0),
+          match_info.get('match_type', 'unknown'))
+         for _, matches in _result_sections(results, 'matches_by_card_type')
+         for match_info in matches.values()
+         for bank_row in match_info['bank_rows']],
+        columns=['bank_row', 'Expected_Amount', 'Actual_Total', 'match_type']
+    )
+    
+    # Look up every matched row in the bank statement with one join
+    details = _join_bank_details(matches_df, bank_statement)
+    match_type_info = details.pop('match_type').to_dict()
+    transaction_details = details.to_dict('index')
     
     return transaction_details, match_type_info
 
@@ -682,43 +910,18 @@ def extract_unmatched_transactions_for_comments(results: dict, bank_statement: p
     Returns:
         dict: Dictionary mapping bank rows to unmatched transaction details
     """
-    unmatched_transactions = {}
-    
-    for date, date_results in results.items():
-        # Skip metadata keys that start with underscore
-        if isinstance(date, str) and date.startswith('_'):
-            continue
-        
-        # Also skip if date_results is not a dictionary with expected structure
-        if not isinstance(date_results, dict) or 'unmatched_by_card_type' not in date_results:
-            continue
-        
-        # Process unmatched transactions
-        for card_type, unmatch_info in date_results['unmatched_by_card_type'].items():
-            # Get bank rows that were attempted but not matched
-            if 'bank_rows' in unmatch_info and unmatch_info['bank_rows']:
-                for bank_row in unmatch_info['bank_rows']:
-                    # Find the transaction in the bank statement
-                    if bank_row <= len(bank_statement) + 1:  # +1 for header row
-                        bank_idx = bank_row - 2  # Convert to 0-based index
-                        if 0 <= bank_idx < len(bank_statement):
-                            transaction = bank_statement.iloc[bank_idx]
-                            
-                            # Create unmatched transaction details for comment
-                            unmatched_transactions[bank_row] = {
-                                'Date': transaction.get('Date', ''),
-                                'Description': transaction.get('Description', ''),
-                                'Amount': transaction.get('Amount', 0),
-                                'Card_Type': transaction.get('Card_Type', ''),
-                                'Transaction_Type': transaction.get('Transaction_Type', ''),
-                                'reason': unmatch_info.get('reason', 'No match found'),
-                                'filters_tried': unmatch_info.get('filters_tried', []),
-                                'expected': unmatch_info.get('expected', 0),
-                                'total_found': unmatch_info.get('total_found', 0),
-                                'found_transactions': unmatch_info.get('found_transactions', 0)
-                            }
-    
-    return unmatched_transactions
+    # Flatten the nested results into one record per attempted bank row
+    unmatched_df = pd.DataFrame.from_records(
+        [(bank_row, unmatch_info.get('reason', 'No match found'), unmatch_info.get('filters_tried', []),
+          unmatch_info.get('expected', 0), unmatch_info.get('total_found', 0),
+          unmatch_info.get('found_transactions', 0))
+         for _, unmatched in _result_sections(results, 'unmatched_by_card_type')
+         for unmatch_info in unmatched.values()
+         for bank_row in unmatch_info.get('bank_rows') or []],
+        columns=['bank_row', 'reason', 'filters_tried', 'expected', 'total_found', 'found_transactions']
+    )
+    
+    return _join_bank_details(unmatched_df, bank_statement).to_dict('index')
 
 def extract_gc_transactions_for_comments(results: dict, bank_statement: pd.DataFrame) -> dict:
     """
@@ -7,9 +7,12 @@ import pandas as pd
 from datetime import datetime
 
 def run_card_matching(card_summary_path: str, bank_statement_path: str, 
-                      output_dir: str = '.', verbose: bool = False, forward_days: int = 3):
+                      output_dir: str = '.', verbose: bool = False, forward_days: int = 3,
+                      bank_df: pd.DataFrame = None, fast_excel: bool = False):
     """
     Run the credit card matching process.
+    Pass an already preprocessed bank statement as bank_df to skip re-reading bank_statement_path.
+    fast_excel writes the highlighted card summary through a write-only workbook.
     """
     from preprocess_bank_statement import preprocess_bank_statement
     from preprocess_card_summary import preprocess_card_summary_dynamic, create_highlighted_card_summary_dynamic
@@ -21,7 +24,7 @@ def run_card_matching(card_summary_path: str, bank_statement_path: str,
     print("=== Credit Card Transaction Matching ===\n")
     
     # Load data
-    bank_statement = preprocess_bank_statement(bank_statement_path)
+    bank_statement = bank_df.copy() if bank_df is not None else preprocess_bank_statement(bank_statement_path)
     card_summary, structure_info = preprocess_card_summary_dynamic(card_summary_path)
     
     # Prepare data
@@ -85,7 +88,8 @@ def run_card_matching(card_summary_path: str, bank_statement_path: str,
         output_path=f'{output_dir}/card_summary_highlighted.xlsx',
         differences_info=differences_by_date_type,
         unmatched_info=unmatched_info,
-        differences_by_card_type=discrepancies_by_type  # ADD THIS PARAMETER
+        differences_by_card_type=discrepancies_by_type,  # ADD THIS PARAMETER
+        fast_excel=fast_excel
     )
     
     print(f"✓ Card matching complete. Files saved to {output_dir}/")
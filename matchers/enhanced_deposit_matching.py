@@ -281,9 +281,13 @@ class EnhancedDepositMatcher:
 
 
 def process_deposit_slip_enhanced(deposit_slip_path: str, bank_statement_path: str,
-                                 output_dir: str = '.', verbose: bool = False):
+                                 output_dir: str = '.', verbose: bool = False,
+                                 bank_df: Optional[pd.DataFrame] = None,
+                                 fast_excel: bool = False):
     """
     Enhanced deposit slip processing with flexible matching strategies.
+    Pass an already preprocessed bank statement as bank_df to skip re-reading bank_statement_path.
+    fast_excel writes the highlighted deposit slip through a write-only workbook.
     """
     from processors.preprocess_deposit_slip import preprocess_deposit_slip_dynamic, create_highlighted_deposit_slip
     from processors.preprocess_bank_statement import preprocess_bank_statement
@@ -292,7 +296,7 @@ def process_deposit_slip_enhanced(deposit_slip_path: str, bank_statement_path: s
     
     # Load data
     deposit_slip, structure_info = preprocess_deposit_slip_dynamic(deposit_slip_path)
-    bank_statement = preprocess_bank_statement(bank_statement_path)
+    bank_statement = bank_df.copy() if bank_df is not None else preprocess_bank_statement(bank_statement_path)
     
     # Add row numbers
     bank_statement['Bank_Row_Number'] = range(2, len(bank_statement) + 2)
@@ -405,7 +409,8 @@ def process_deposit_slip_enhanced(deposit_slip_path: str, bank_statement_path: s
         output_path=f'{output_dir}/deposit_slip_enhanced_highlighted.xlsx',
         unmatched_info=unmatched_info,
         gc_allocation=gc_allocations,
-        deposit_discrepancies=deposit_discrepancies
+        deposit_discrepancies=deposit_discrepancies,
+        fast_excel=fast_excel
     )
     
     # Extract transaction details for comments
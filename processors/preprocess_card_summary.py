@@ -1,13 +1,20 @@
 import pandas as pd
 import numpy as np
 
+# Prefer the much faster calamine reader when python-calamine is installed
+try:
+    import python_calamine  # noqa: F401
+    _EXCEL_ENGINE = 'calamine'
+except ImportError:
+    _EXCEL_ENGINE = None
+
 def detect_card_summary_structure(filepath='card summary june.xlsx'):
     """
     Dynamically detect the structure of a card summary file.
     Returns the data rows and rows to skip.
     """
     # Read all rows first to analyze structure
-    df_raw = pd.read_excel(filepath, header=None)
+    df_raw = pd.read_excel(filepath, header=None, engine=_EXCEL_ENGINE)
     
     # Find the header row by looking for 'Date' in first column
     header_row = None
@@ -67,7 +74,7 @@ def preprocess_card_summary_dynamic(filepath='card summary june.xlsx'):
     skip_rows, header_row, data_start_row, total_row = detect_card_summary_structure(filepath)
     
     # Load the Excel file with detected skip rows
-    card_summary = pd.read_excel(filepath, skiprows=skip_rows)
+    card_summary = pd.read_excel(filepath, skiprows=skip_rows, engine=_EXCEL_ENGINE)
     
     # Convert date to datetime
     card_summary['Date'] = pd.to_datetime(card_summary['Date'])
@@ -96,90 +103,58 @@ def create_highlighted_card_summary_dynamic(card_summary_path: str, matched_date
                                           differences_info: dict = None,
                                           unmatched_info: dict = None, 
                                           unmatched_bank_by_type: dict = None,
-                                          differences_by_card_type: dict = None):
+                                          differences_by_card_type: dict = None,
+                                          fast_excel: bool = False):
     """
     Create highlighted card summary with dynamic structure detection.
     Now with simplified total row comments showing just the sum of differences.
+    Set fast_excel to stream the output through a write-only workbook (see highlight_workbook).
     """
-    import shutil
-    from openpyxl import load_workbook
-    from openpyxl.styles import PatternFill, Font
     from openpyxl.comments import Comment
-    import openpyxl.styles
+    from highlighting_functions import (
+        highlight_workbook, add_net_discrepancy_row, format_money,
+        GREEN_FONT, RED_FONT
+    )
     
     # Get the structure info
     card_summary_df, structure_info = preprocess_card_summary_dynamic(card_summary_path)
     
-    # Copy the original Excel file
-    shutil.copy2(card_summary_path, output_path)
-    
-    # Load the workbook
-    workbook = load_workbook(output_path)
-    worksheet = workbook.active
-    
-    # Define highlight colors (text colors instead of background)
-    green_font = Font(color='006400')  # Dark green for matched
-    red_font = Font(color='DC143C')    # Crimson red for unmatched
-    
-    # Create mapping of dates to Excel rows
-    excel_row_mapping = {}
-    excel_row = structure_info['data_start_row'] + 1  # +1 for 1-based Excel rows
-    
-    for idx, row in card_summary_df.iterrows():
-        # Skip rows that were skipped in original
-        while (excel_row - 1) in structure_info['skip_rows']:
-            excel_row += 1
-        excel_row_mapping[row['Date']] = excel_row
-        excel_row += 1
-    
-    # Find column indices for card types
-    header_row = structure_info['header_row'] + 1  # +1 for 1-based Excel rows
-    column_mapping = {}
-    
-    for col_idx in range(1, worksheet.max_column + 1):
-        cell_value = worksheet.cell(row=header_row, column=col_idx).value
-        if cell_value:
-            column_mapping[str(cell_value).strip()] = col_idx
-    
     # Process all data rows (not including total)
-    matched_cells_count = 0
-    unmatched_cells_count = 0
+    counts = {'matched': 0, 'unmatched': 0}
+    
+    def is_card_type_column(card_type):
+        return card_type not in ['Date', 'Total', 'Visa & MC'] and not card_type.startswith('Unnamed')
     
-    for _, row in card_summary_df.iterrows():
-        date = row['Date']
-        excel_row = excel_row_mapping[date]
+    def decide_cell(date, card_type, expected_amount, expected_text):
+        # Check if matched
+        if matched_dates_and_types and date in matched_dates_and_types and card_type in matched_dates_and_types[date]:
+            counts['matched'] += 1
+            return GREEN_FONT, None
         
-        # Process each card type
-        for card_type in column_mapping.keys():
-            if card_type in ['Date', 'Total', 'Visa & MC'] or card_type.startswith('Unnamed'):
-                continue
-                
-            if card_type in column_mapping and card_type in row.index:
-                expected_amount = row[card_type]
-                if pd.notna(expected_amount) and expected_amount != 0:
-                    col_idx = column_mapping[card_type]
-                    cell = worksheet.cell(row=excel_row, column=col_idx)
-                    
-                    # Check if matched
-                    if matched_dates_and_types and date in matched_dates_and_types and card_type in matched_dates_and_types[date]:
-                        cell.font = green_font
-                        matched_cells_count += 1
-                    elif unmatched_info and (date, card_type) in unmatched_info:
-                        cell.font = red_font
-                        unmatched_cells_count += 1
-                        
-                        # Add comment
-                        info = unmatched_info[(date, card_type)]
-                        comment_text = f"Expected: ${expected_amount:,.2f}\n"
-                        comment_text += f"Found: ${info.get('total_found', 0):,.2f}\n"
-                        comment_text += f"Difference: ${info.get('total_found', 0) - expected_amount:,.2f}\n"
-                        comment_text += f"Unmatched transactions available: {info.get('found_transactions', 0)}\n"
-                        comment_text += "\nNote: 'Found' amount excludes transactions already matched elsewhere"
-                        
-                        cell.comment = Comment(comment_text, "Matching System")
+        if unmatched_info and (date, card_type) in unmatched_info:
+            counts['unmatched'] += 1
+            
+            # Add comment
+            info = unmatched_info[(date, card_type)]
+            total_found = info.get('total_found', 0)
+            comment_text = "\n".join([
+                "Expected: " + expected_text,
+                "Found: " + format_money(total_found),
+                "Difference: " + format_money(total_found - expected_amount),
+                "Unmatched transactions available: " + str(info.get('found_transactions', 0)),
+                "",
+                "Note: 'Found' amount excludes transactions already matched elsewhere"
+            ])
+            return RED_FONT, Comment(comment_text, "Matching System")
+        
+        return None, None
     
-    # Handle total row with simplified differences if provided
-    if structure_info['total_row'] is not None and differences_by_card_type:
+    def extra_cells(column_mapping):
+        cells = {}
+        if structure_info['total_row'] is None or not differences_by_card_type:
+            return cells
+        
+        # Handle total row with simplified differences
         total_excel_row = structure_info['total_row'] + 1  # +1 for Excel
         
         for card_type, col_idx in column_mapping.items():
@@ -187,8 +162,6 @@ def create_highlighted_card_summary_dynamic(card_summary_path: str, matched_date
                 diff = differences_by_card_type[card_type]
                 # Only add comment if there's a non-zero difference
                 if abs(diff) > 0.01:
-                    cell = worksheet.cell(row=total_excel_row, column=col_idx)
-                    
                     comment_text = f"Net Discrepancy:\n${diff:,.2f}"
                     if diff > 0:
                         comment_text += "\n\n(Bank has ${abs(diff):,.2f} MORE than expected)"
@@ -197,46 +170,22 @@ def create_highlighted_card_summary_dynamic(card_summary_path: str, matched_date
                         comment_text += "\n\n(Bank has ${abs(diff):,.2f} LESS than expected)"
                         comment_text += "\nPossible causes: missing transactions,\nunprocessed charges, or timing differences"
                     
-                    cell.comment = Comment(comment_text, "Difference Summary")
-    
-    # ADD NEW DISCREPANCY ROW below the total row
-    if structure_info['total_row'] is not None and differences_by_card_type:
-        discrepancy_row = structure_info['total_row'] + 2  # +2 to be below total row
+                    cells[(total_excel_row, col_idx)] = {'comment': Comment(comment_text, "Difference Summary")}
         
-        # Add label in first column
-        label_cell = worksheet.cell(row=discrepancy_row, column=1)
-        label_cell.value = "Net Discrepancy"
-        label_cell.font = Font(bold=True)
-        
-        # Add discrepancy values for each card type
-        for card_type, col_idx in column_mapping.items():
-            if card_type in differences_by_card_type and card_type not in ['Date', 'Total', 'Visa & MC']:
-                diff = differences_by_card_type[card_type]
-                cell = worksheet.cell(row=discrepancy_row, column=col_idx)
-                
-                # Format positive/negative with appropriate colors
-                if abs(diff) > 0.01:
-                    cell.value = diff
-                    cell.number_format = '$#,##0.00'
-                    
-                    # Color code: red for negative (bank has less), blue for positive (bank has more)
-                    if diff > 0:
-                        cell.font = Font(color='0000FF', bold=True)  # Blue for positive
-                    else:
-                        cell.font = Font(color='FF0000', bold=True)  # Red for negative
-                else:
-                    cell.value = 0
-                    cell.number_format = '$#,##0.00'
-                    cell.font = Font(color='008000', bold=True)  # Green for zero
+        # ADD NEW DISCREPANCY ROW below the total row
+        cells.update(add_net_discrepancy_row(
+            structure_info['total_row'] + 2, column_mapping, differences_by_card_type,
+            lambda card_type: card_type not in ['Date', 'Total', 'Visa & MC']
+        ))
+        return cells
     
-    # Save
-    workbook.save(output_path)
-    workbook.close()
+    highlight_workbook(card_summary_path, output_path, card_summary_df, structure_info,
+                       is_card_type_column, decide_cell, extra_cells, write_only=fast_excel)
     
     print(f"✓ Created highlighted card summary: {output_path}")
     print(f"  - Detected {len(card_summary_df)} data rows")
-    print(f"  - Matched cells (green): {matched_cells_count}")
-    print(f"  - Unmatched cells with comments (red): {unmatched_cells_count}")
+    print(f"  - Matched cells (green): {counts['matched']}")
+    print(f"  - Unmatched cells with comments (red): {counts['unmatched']}")
     if differences_by_card_type:
         non_zero_diffs = sum(1 for d in differences_by_card_type.values() if abs(d) > 0.01)
         if non_zero_diffs > 0:
@@ -1,55 +1,82 @@
+import os
+import re
+from functools import lru_cache
 import pandas as pd
 import numpy as np
+from openpyxl import load_workbook
+from openpyxl.comments import Comment
+from highlighting_functions import (
+    highlight_workbook, add_net_discrepancy_row, format_money,
+    GREEN_FONT, RED_FONT, YELLOW_FONT
+)
+
+# First-column patterns used to classify deposit slip rows
+DATE_RE = re.compile(r'^\s*\d{1,4}[-/]\d{1,2}[-/]\d{1,4}')
+FACILITY_RE = re.compile(r'facility', re.IGNORECASE)
+FACILITY_NAME_RE = re.compile(r'Facility Name:')
 
 def detect_deposit_slip_structure(filepath):
     """
     Dynamically detect the structure of a deposit slip file.
     Similar to card summary but adapted for deposit slip format.
+    Also returns the raw sheet so the caller can slice the data out of it
+    instead of reading the workbook a second time.
     """
-    # Read all rows first to analyze structure
-    df_raw = pd.read_excel(filepath, header=None)
+    # Stream the first sheet once in read-only mode
+    rows = []
+    last_row_with_data = -1
     
-    # Find the header row by looking for 'Date' in first column
-    header_row = None
-    for idx, row in df_raw.iterrows():
-        if pd.notna(row[0]) and 'Date' in str(row[0]):
-            header_row = idx
-            break
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        # Read-only sheets trust the stored <dimension> tag, which exported files often leave stale
+        worksheet.reset_dimensions()
+        for idx, values in enumerate(worksheet.iter_rows(values_only=True)):
+            # Trim trailing empty cells the same way pd.read_excel does
+            values = list(values)
+            while values and values[-1] is None:
+                values.pop()
+            if values:
+                last_row_with_data = idx
+            rows.append(values)
+    finally:
+        workbook.close()
     
-    if header_row is None:
-        raise ValueError("Could not find header row with 'Date'")
+    # Drop trailing empty rows; ragged rows and empty cells become NaN like in pd.read_excel
+    df_raw = pd.DataFrame(rows[:last_row_with_data + 1]).fillna(np.nan)
     
-    # Find the first data row (skip facility name rows)
-    data_start_row = None
-    for idx in range(header_row + 1, len(df_raw)):
-        try:
-            # Check if this looks like a date (not a facility name)
-            cell_value = str(df_raw.iloc[idx, 0]).strip()
-            if 'Facility Name:' in cell_value or 'facility' in cell_value.lower():
-                continue
-            pd.to_datetime(cell_value)
-            data_start_row = idx
-            break
-        except:
-            continue
+    # Classify the first column with vectorized string masks
+    first_col = df_raw[0]
+    present = first_col.notna()
+    col0 = first_col.astype(str).str.strip()
     
-    # Find the total row (look for the LAST "Total" in the first column)
-    total_row = None
-    for idx in range(len(df_raw) - 1, data_start_row - 1, -1):  # Search backwards
-        if pd.notna(df_raw.iloc[idx, 0]) and str(df_raw.iloc[idx, 0]).strip() == 'Total':
-            total_row = idx
-            break
+    # Find the header row by looking for 'Date' in first column
+    header_mask = present & col0.str.contains('Date', regex=False)
+    if not header_mask.any():
+        raise ValueError("Could not find header row with 'Date'")
+    header_row = int(header_mask.idxmax())
     
-    # Find any facility name rows and intermediate total rows
-    facility_rows = []
-    intermediate_total_rows = []
-    for idx in range(data_start_row, len(df_raw)):
-        if pd.notna(df_raw.iloc[idx, 0]):
-            cell_value = str(df_raw.iloc[idx, 0]).strip()
-            if 'Facility Name:' in cell_value:
-                facility_rows.append(idx)
-            elif cell_value == 'Total' and idx != total_row:  # Skip the final total row
-                intermediate_total_rows.append(idx)
+    # Find the first data row (first date below the header, skipping facility name rows).
+    # Numeric dates (including Excel dates, which stringify as YYYY-MM-DD) are found with a
+    # regex; only sheets without any fall back to the slower free-form date parsing.
+    facility_mask = present & col0.str.contains(FACILITY_RE)
+    candidate_mask = present & ~facility_mask & (col0.index > header_row)
+    date_mask = candidate_mask & col0.str.match(DATE_RE)
+    if date_mask.any():
+        data_start_row = date_mask.idxmax()
+    else:
+        candidates = col0.where(candidate_mask)
+        data_start_row = pd.to_datetime(candidates, errors='coerce', format='mixed').first_valid_index()
+    if data_start_row is None:
+        raise ValueError("Could not find any data rows below the header")
+    data_start_row = int(data_start_row)
+    
+    # Find facility name rows and "Total" rows; the LAST "Total" is the grand total
+    in_data = present & (col0.index >= data_start_row)
+    facility_rows = col0.index[in_data & col0.str.contains(FACILITY_NAME_RE)].tolist()
+    total_rows = col0.index[in_data & col0.eq('Total')].tolist()
+    total_row = total_rows[-1] if total_rows else None
+    intermediate_total_rows = total_rows[:-1]
     
     # Build skip rows list
     skip_rows = []
@@ -67,39 +94,83 @@ def detect_deposit_slip_structure(filepath):
     print(f"  Total row: {total_row}")
     print(f"  Skip rows: {skip_rows}")
     
-    return skip_rows, header_row, data_start_row, total_row
+    return skip_rows, header_row, data_start_row, total_row, df_raw
+
+def _header_names(header_values):
+    """
+    Build column names from a raw header row the same way pd.read_excel does:
+    blank headers become 'Unnamed: N' and repeated headers get a '.N' suffix.
+    """
+    names = []
+    seen = {}
+    for col_idx, value in enumerate(header_values):
+        name = f'Unnamed: {col_idx}' if pd.isna(value) else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
 
 def preprocess_deposit_slip_dynamic(filepath):
     """
     Dynamically load and preprocess deposit slip Excel file.
     Handles Cash and Check columns specifically.
+    
+    Parsed results are cached per (path, modification time, size), so matching and
+    highlighting the same unchanged file only parses it once. Callers get their own
+    copies and are free to modify them.
+    """
+    stat = os.stat(filepath)
+    deposit_slip, structure_info = _parse_deposit_slip(os.path.abspath(filepath), stat.st_mtime, stat.st_size)
+    return deposit_slip.copy(), {
+        **structure_info,
+        'skip_rows': list(structure_info['skip_rows']),
+        'deposit_columns': list(structure_info['deposit_columns'])
+    }
+
+@lru_cache(maxsize=8)
+def _parse_deposit_slip(filepath, mtime, size):
+    """
+    Parse a deposit slip; mtime and size are only part of the cache key.
+    The cached results must not be modified - preprocess_deposit_slip_dynamic hands out copies.
     """
     # Detect structure
-    skip_rows, header_row, data_start_row, total_row = detect_deposit_slip_structure(filepath)
+    skip_rows, header_row, data_start_row, total_row, df_raw = detect_deposit_slip_structure(filepath)
     
-    # Load the Excel file
-    deposit_slip = pd.read_excel(filepath, skiprows=skip_rows)
+    # Set form of skip_rows for O(1) membership tests
+    skip_rows_set = frozenset(skip_rows)
     
-    # Convert date to datetime
-    deposit_slip['Date'] = pd.to_datetime(deposit_slip['Date'])
+    # Slice the data rows out of the already-loaded sheet instead of re-reading the file
+    data_mask = ~df_raw.index.isin(skip_rows_set | {header_row})
+    deposit_slip = df_raw[data_mask].reset_index(drop=True).infer_objects()
+    deposit_slip.columns = _header_names(df_raw.iloc[header_row])
+    
+    # Convert date to datetime; Excel date cells already arrive as datetime64
+    if not pd.api.types.is_datetime64_any_dtype(deposit_slip['Date']):
+        deposit_slip['Date'] = pd.to_datetime(deposit_slip['Date'], cache=True)
     
     # Clean column names
     deposit_slip.columns = deposit_slip.columns.str.strip()
     
     # Identify Cash and Check columns (adjust these names based on your actual file)
-    deposit_columns = []
-    for col in deposit_slip.columns:
-        if 'Cash' in col or 'Check' in col:
-            deposit_columns.append(col)
+    deposit_columns = deposit_slip.columns[deposit_slip.columns.str.contains('Cash|Check', na=False)].tolist()
     
     # Convert numeric columns
-    for col in deposit_columns:
-        if col in deposit_slip.columns:
-            deposit_slip[col] = pd.to_numeric(deposit_slip[col], errors='coerce').fillna(0)
+    if deposit_columns:
+        deposit_slip[deposit_columns] = deposit_slip[deposit_columns].apply(pd.to_numeric, errors='coerce').fillna(0)
     
     # Add a Total column if not present
     if 'Total' not in deposit_slip.columns and deposit_columns:
-        deposit_slip['Total'] = deposit_slip[deposit_columns].sum(axis=1)
+        # fillna(0) above already ran, so a plain NumPy row sum is enough
+        deposit_slip['Total'] = deposit_slip[deposit_columns].to_numpy(dtype=np.float64, copy=False).sum(axis=1)
+    
+    # Store repetitive text columns (facility, notes, ...) as categories. Amounts stay
+    # float64: matching compares them to bank amounts at cent tolerance
+    for col in deposit_slip.select_dtypes(include='object').columns:
+        if deposit_slip[col].nunique() <= len(deposit_slip) // 2:
+            deposit_slip[col] = deposit_slip[col].astype('category')
     
     return deposit_slip, {
         'skip_rows': skip_rows,
@@ -114,7 +185,8 @@ def create_highlighted_deposit_slip(deposit_slip_path: str,
                                   output_path: str = 'deposit_slip_highlighted.xlsx',
                                   unmatched_info: dict = None,
                                   gc_allocation: dict = None,
-                                  deposit_discrepancies: dict = None):
+                                  deposit_discrepancies: dict = None,
+                                  fast_excel: bool = False):
     """
     Create highlighted deposit slip with special handling for GC allocations.
     
@@ -124,167 +196,97 @@ def create_highlighted_deposit_slip(deposit_slip_path: str,
         output_path: Output path for highlighted file
         unmatched_info: Information about unmatched entries
         gc_allocation: Dict showing how GC transactions were allocated between Cash/Check
+        deposit_discrepancies: Net difference per deposit type for the discrepancy row
+        fast_excel: Stream the output through a write-only workbook (see highlight_workbook)
     """
-    import shutil
-    from openpyxl import load_workbook
-    from openpyxl.styles import PatternFill, Font
-    from openpyxl.comments import Comment
-    
     # Get the structure info
     deposit_slip_df, structure_info = preprocess_deposit_slip_dynamic(deposit_slip_path)
     
-    # Copy the original Excel file
-    shutil.copy2(deposit_slip_path, output_path)
-    
-    # Load the workbook
-    workbook = load_workbook(output_path)
-    worksheet = workbook.active
-    
-    # Define highlight colors (text colors instead of background)
-    green_font = Font(color='006400')  # Dark green for matched
-    red_font = Font(color='DC143C')    # Crimson red for unmatched
-    yellow_font = Font(color='B8860B') # Dark goldenrod for special cases
-    # Create mapping of dates to Excel rows
-    excel_row_mapping = {}
-    excel_row = structure_info['data_start_row'] + 1
-    
-    for idx, row in deposit_slip_df.iterrows():
-        while (excel_row - 1) in structure_info['skip_rows']:
-            excel_row += 1
-        excel_row_mapping[row['Date']] = excel_row
-        excel_row += 1
-    
-    # Find column indices for deposit types
-    header_row = structure_info['header_row'] + 1
-    column_mapping = {}
-    
-    for col_idx in range(1, worksheet.max_column + 1):
-        cell_value = worksheet.cell(row=header_row, column=col_idx).value
-        if cell_value:
-            column_mapping[str(cell_value).strip()] = col_idx
+    # Process Cash and Check columns
+    counts = {'matched': 0, 'unmatched': 0, 'gc_1416': 0}
     
-    # Process all data rows
-    matched_cells_count = 0
-    unmatched_cells_count = 0
-    gc_1416_cells_count = 0
+    # Matched deposit types per date, limited to this slip's deposit columns, so a
+    # non-empty set means at least one of the date's columns was matched
+    deposit_column_set = frozenset(structure_info['deposit_columns'])
+    matched_sets = {date: frozenset(types) & deposit_column_set
+                    for date, types in (matched_dates_and_types or {}).items()}
     
-    for _, row in deposit_slip_df.iterrows():
-        date = row['Date']
-        excel_row = excel_row_mapping[date]
-        
-        # Process Cash and Check columns
-        for deposit_type in structure_info['deposit_columns']:
-            if deposit_type in column_mapping and deposit_type in row.index:
-                expected_amount = row[deposit_type]
-                if pd.notna(expected_amount) and expected_amount != 0:
-                    col_idx = column_mapping[deposit_type]
-                    cell = worksheet.cell(row=excel_row, column=col_idx)
-                    
-                    # Check if matched
-                    if matched_dates_and_types and date in matched_dates_and_types:
-                        if deposit_type in matched_dates_and_types[date]:
-                            cell.font = green_font
-                            matched_cells_count += 1
-                            
-                            # Add comment if this was from GC allocation
-                            if gc_allocation and (date, deposit_type) in gc_allocation:
-                                alloc_info = gc_allocation[(date, deposit_type)]
-                                comment_text = f"Matched from GC transactions:\n"
-                                comment_text += f"Allocated ${alloc_info['amount']:,.2f} to {deposit_type}\n"
-                                comment_text += f"Bank rows: {', '.join(map(str, alloc_info['bank_rows'][:5]))}"
-                                if len(alloc_info['bank_rows']) > 5:
-                                    comment_text += f"... and {len(alloc_info['bank_rows'])-5} more"
-                                cell.comment = Comment(comment_text, "GC Allocation")
-                                gc_1416_cells_count += 1
-                        else:
-                            # Check if partially matched (e.g., Cash matched but Check didn't)
-                            if any(dt in matched_dates_and_types[date] for dt in structure_info['deposit_columns']):
-                                cell.font = yellow_font  # Partial match for the date
-
-                    # NEW: Check for best match (yellow highlighting)
-                    elif unmatched_info and (date, deposit_type) in unmatched_info:
-                        info = unmatched_info[(date, deposit_type)]
-                        
-                        # Check if this has a best_match stored
-                        if 'best_match' in info and info['best_match'] and info['best_match']['total'] > 0:
-                            # Yellow for approximate matches
-                            cell.font = yellow_font
-                            best_match = info['best_match']
-                            
-                            # Add detailed comment
-                            comment_text = f"Expected: ${expected_amount:,.2f}\n"
-                            comment_text += f"Best match found: ${best_match['total']:.2f}\n"
-                            comment_text += f"Difference: ${best_match['difference']:.2f}\n"
-                            comment_text += f"Using {best_match['combo_size']} GC transaction(s)\n"
-                            comment_text += f"Bank rows: {', '.join(map(str, best_match['bank_rows'][:5]))}"
-                            if len(best_match['bank_rows']) > 5:
-                                comment_text += f"... and {len(best_match['bank_rows'])-5} more"
-                            
-                            cell.comment = Comment(comment_text, "Best Match (Not Exact)")
-                        else:
-                            # Red for no matches at all
-                            cell.font = red_font
-                            unmatched_cells_count += 1
-                            
-                            comment_text = f"Expected: ${expected_amount:,.2f}\n"
-                            comment_text += f"No GC transactions found\n"
-                            comment_text += info.get('reason', 'No matches in date range')
-                            
-                            cell.comment = Comment(comment_text, "Unmatched")
-                    
-                    elif unmatched_info and (date, deposit_type) in unmatched_info:
-                        # Unmatched cell
-                        cell.font = red_font
-                        unmatched_cells_count += 1
-                        
-                        info = unmatched_info[(date, deposit_type)]
-                        comment_text = f"Expected: ${expected_amount:,.2f}\n"
-                        comment_text += f"Found GC: ${info.get('gc_found', 0):,.2f}\n"
-                        comment_text += f"Difference: ${info.get('gc_found', 0) - expected_amount:,.2f}\n"
-                        comment_text += "\nNote: GC transactions can be either Cash or Check"
-                        
-                        cell.comment = Comment(comment_text, "Matching System")
-    
-    # ADD NEW DISCREPANCY ROW below the total row
-    if structure_info['total_row'] is not None and deposit_discrepancies:
-        from openpyxl.styles import Font
-        discrepancy_row = structure_info['total_row'] + 2  # +2 to be below total row
-        
-        # Add label in first column
-        label_cell = worksheet.cell(row=discrepancy_row, column=1)
-        label_cell.value = "Net Discrepancy"
-        label_cell.font = Font(bold=True)
+    def decide_cell(date, deposit_type, expected_amount, expected_text):
+        # Check if matched
+        matched_types = matched_sets.get(date)
+        if matched_types is not None:
+            if deposit_type in matched_types:
+                counts['matched'] += 1
+                
+                # Add comment if this was from GC allocation
+                if gc_allocation and (date, deposit_type) in gc_allocation:
+                    alloc_info = gc_allocation[(date, deposit_type)]
+                    comment_parts = [
+                        "Matched from GC transactions:\n",
+                        "Allocated ", format_money(alloc_info['amount']), " to ", deposit_type, "\n",
+                        "Bank rows: ", ', '.join(map(str, alloc_info['bank_rows'][:5]))
+                    ]
+                    if len(alloc_info['bank_rows']) > 5:
+                        comment_parts.append(f"... and {len(alloc_info['bank_rows'])-5} more")
+                    counts['gc_1416'] += 1
+                    return GREEN_FONT, Comment("".join(comment_parts), "GC Allocation")
+                return GREEN_FONT, None
+            
+            # Check if partially matched (e.g., Cash matched but Check didn't)
+            if matched_types:
+                return YELLOW_FONT, None  # Partial match for the date
+            return None, None
         
-        # Add discrepancy values for each deposit type
-        for deposit_type, col_idx in column_mapping.items():
-            if deposit_type in deposit_discrepancies and deposit_type in ['Cash', 'Check']:
-                diff = deposit_discrepancies[deposit_type]
-                cell = worksheet.cell(row=discrepancy_row, column=col_idx)
+        # NEW: Check for best match (yellow highlighting)
+        if unmatched_info and (date, deposit_type) in unmatched_info:
+            info = unmatched_info[(date, deposit_type)]
+            
+            # Check if this has a best_match stored
+            if 'best_match' in info and info['best_match'] and info['best_match']['total'] > 0:
+                # Yellow for approximate matches
+                best_match = info['best_match']
                 
-                # Format positive/negative with appropriate colors
-                if abs(diff) > 0.01:
-                    cell.value = diff
-                    cell.number_format = '$#,##0.00'
-                    
-                    # Color code: red for negative (bank has less), blue for positive (bank has more)
-                    if diff > 0:
-                        cell.font = Font(color='0000FF', bold=True)  # Blue for positive
-                    else:
-                        cell.font = Font(color='FF0000', bold=True)  # Red for negative
-                else:
-                    cell.value = 0
-                    cell.number_format = '$#,##0.00'
-                    cell.font = Font(color='008000', bold=True)  # Green for zero
+                # Add detailed comment
+                comment_parts = [
+                    "Expected: ", expected_text, "\n",
+                    f"Best match found: ${best_match['total']:.2f}\n",
+                    f"Difference: ${best_match['difference']:.2f}\n",
+                    f"Using {best_match['combo_size']} GC transaction(s)\n",
+                    "Bank rows: ", ', '.join(map(str, best_match['bank_rows'][:5]))
+                ]
+                if len(best_match['bank_rows']) > 5:
+                    comment_parts.append(f"... and {len(best_match['bank_rows'])-5} more")
+                return YELLOW_FONT, Comment("".join(comment_parts), "Best Match (Not Exact)")
+            
+            # Red for no matches at all
+            counts['unmatched'] += 1
+            comment_text = "".join([
+                "Expected: ", expected_text, "\n",
+                "No GC transactions found\n",
+                info.get('reason', 'No matches in date range')
+            ])
+            return RED_FONT, Comment(comment_text, "Unmatched")
+        
+        return None, None
+    
+    def extra_cells(column_mapping):
+        # ADD NEW DISCREPANCY ROW below the total row
+        if structure_info['total_row'] is None or not deposit_discrepancies:
+            return {}
+        return add_net_discrepancy_row(
+            structure_info['total_row'] + 2, column_mapping, deposit_discrepancies,
+            lambda deposit_type: deposit_type in ['Cash', 'Check']
+        )
     
-    # Save
-    workbook.save(output_path)
-    workbook.close()
+    highlight_workbook(deposit_slip_path, output_path, deposit_slip_df, structure_info,
+                       lambda column: column in structure_info['deposit_columns'],
+                       decide_cell, extra_cells, write_only=fast_excel)
     
     print(f"✓ Created highlighted deposit slip: {output_path}")
     print(f"  - Detected {len(deposit_slip_df)} data rows")
-    print(f"  - Matched cells (green): {matched_cells_count}")
-    print(f"  - GC allocations: {gc_1416_cells_count}")
-    print(f"  - Unmatched cells (red): {unmatched_cells_count}")
+    print(f"  - Matched cells (green): {counts['matched']}")
+    print(f"  - GC allocations: {counts['gc_1416']}")
+    print(f"  - Unmatched cells (red): {counts['unmatched']}")
     if deposit_discrepancies:
         non_zero_diffs = sum(1 for d in deposit_discrepancies.values() if abs(d) > 0.01)
         if non_zero_diffs > 0:
@@ -3,15 +3,21 @@
 Simple launcher script for the Bank Reconciliation System
 """
 
+import importlib.util
 import subprocess
 import sys
 import os
 
 def main():
     """Launch the Streamlit application"""
+    # Check if streamlit is installed without importing it; the subprocess loads it
+    if importlib.util.find_spec("streamlit") is None:
+        print("❌ Streamlit is not installed!")
+        print("📦 Please install dependencies first:")
+        print("   pip install -r requirements.txt")
+        sys.exit(1)
+    
     try:
-        # Check if streamlit is installed
-        import streamlit
         print("🚀 Starting Bank Reconciliation System...")
         print("📱 Open your browser to http://localhost:8501")
         print("⏹️  Press Ctrl+C to stop the application")
@@ -24,11 +30,6 @@ def main():
             "--server.runOnSave", "true"
         ])
         
-    except ImportError:
-        print("❌ Streamlit is not installed!")
-        print("📦 Please install dependencies first:")
-        print("   pip install -r requirements.txt")
-        sys.exit(1)
     except KeyboardInterrupt:
         print("\n👋 Application stopped by user")
     except Exception as e:
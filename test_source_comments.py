@@ -5,6 +5,7 @@ Comments now show what the bank transaction matched FROM (card summary or deposi
 """
 
 import pandas as pd
+import numpy as np
 import sys
 import os
 from datetime import datetime
@@ -12,8 +13,28 @@ from datetime import datetime
 # Add the current directory to the path
 sys.path.append(os.path.dirname(__file__))
 
+# Card types are a small closed set, so they are stored as a categorical
+CARD_DTYPE = pd.CategoricalDtype(['Visa', 'Amex', 'GC', 'Unknown'])
+
+def tag_card_types(descriptions):
+    """Tag each bank description with its card type in one vectorized pass."""
+    desc = descriptions.to_numpy(dtype=str)
+    card_types = np.select(
+        [np.char.find(desc, 'VISA') >= 0,
+         np.char.find(desc, 'AMEX') >= 0,
+         np.char.find(desc, 'GC') >= 0],
+        ['Visa', 'Amex', 'GC'],
+        default='Unknown'
+    )
+    return pd.Categorical(card_types, dtype=CARD_DTYPE)
+
+def details_frame(details_by_row, defaults):
+    """Turn a {bank_row: details} dict into a DataFrame, filling missing fields with defaults."""
+    df = pd.DataFrame.from_dict(details_by_row, orient='index').reindex(columns=list(defaults))
+    return df.fillna(defaults)
+
 def create_test_data():
-    """Create test data with bank statement and matching results."""
+    """Create the test bank statement CSV; returns its path and the DataFrame that was written."""
     # Bank statement
     bank_data = {
         'Date': ['2025-01-15', '2025-01-16', '2025-01-17', '2025-01-18'],
@@ -27,17 +48,14 @@ def create_test_data():
         'Transaction_Type': ['CREDIT', 'CREDIT', 'CREDIT', 'CREDIT']
     }
     
-    df = pd.DataFrame(bank_data)
-    df['Bank_Row_Number'] = range(2, len(df) + 2)
-    df['Card_Type'] = df['Description'].apply(lambda x: 
-        'Visa' if 'VISA' in x else 
-        'Amex' if 'AMEX' in x else 
-        'GC' if 'GC' in x else 
-        'Unknown'
-    )
+    df = pd.DataFrame(bank_data).astype({
+        'Date': 'string', 'Description': 'string', 'Transaction_Type': 'category', 'Amount': 'float64'
+    })
+    df['Bank_Row_Number'] = np.arange(2, len(df) + 2, dtype=np.int32)
+    df['Card_Type'] = tag_card_types(df['Description'])
     
     df.to_csv('test_bank_statement.csv', index=False)
-    return 'test_bank_statement.csv'
+    return 'test_bank_statement.csv', df
 
 def create_matching_results():
     """Create matching results that show what each bank transaction matched from."""
@@ -106,19 +124,10 @@ def test_source_comments():
     print("Comments now show what the bank transaction matched FROM (card summary or deposit slip)\n")
     
     # Create test data
-    bank_statement_path = create_test_data()
+    # The written CSV is only needed for the highlighted copy; reuse the in-memory frame
+    bank_statement_path, bank_statement = create_test_data()
     print(f"✓ Created test bank statement: {bank_statement_path}")
     
-    # Load the bank statement
-    bank_statement = pd.read_csv(bank_statement_path)
-    bank_statement['Bank_Row_Number'] = range(2, len(bank_statement) + 2)
-    bank_statement['Card_Type'] = bank_statement['Description'].apply(lambda x: 
-        'Visa' if 'VISA' in x else 
-        'Amex' if 'AMEX' in x else 
-        'GC' if 'GC' in x else 
-        'Unknown'
-    )
-    
     # Create matching results
     results = create_matching_results()
     print("✓ Created matching results")
@@ -131,8 +140,14 @@ def test_source_comments():
         extract_gc_transactions_for_comments
     )
     
-    matched_bank_rows = {2, 3}  # Rows 2 and 3 are matched
-    differences_by_row = {2: 0.00, 3: 0.00}
+    # Matched rows (2 and 3) as an integer array, which the highlighter turns into a
+    # boolean row mask; comments look their differences up by row
+    matches = [match_info for date_results in results.values()
+               for match_info in date_results['matches_by_card_type'].values()]
+    matched_bank_rows = np.fromiter(
+        (row for match_info in matches for row in match_info['bank_rows']), dtype=np.int32)
+    differences_by_row = {row: match_info['difference']
+                          for match_info in matches for row in match_info['bank_rows']}
     
     transaction_details, match_type_info = extract_transaction_details_for_comments(results, bank_statement)
     unmatched_transactions = extract_unmatched_transactions_for_comments(results, bank_statement)
@@ -163,22 +178,34 @@ def test_source_comments():
     
     print("\n🟢 MATCHED TRANSACTIONS (Green highlighting):")
     print("Comments show what they matched FROM the card summary:")
-    for bank_row, details in transaction_details.items():
-        print(f"  Row {bank_row}: {details['Description']} - ${details['Amount']:,.2f}")
-        print(f"    → Matched from Card Summary: {details.get('Date', 'Unknown')} {details.get('Card_Type', 'Unknown')} ${details.get('Expected_Amount', 0):,.2f}")
+    matched_df = details_frame(transaction_details, {
+        'Description': '', 'Amount': 0, 'Date': 'Unknown', 'Card_Type': 'Unknown', 'Expected_Amount': 0
+    })
+    matched_df['Amount'] = matched_df['Amount'].map('${:,.2f}'.format)
+    matched_df['Expected_Amount'] = matched_df['Expected_Amount'].map('${:,.2f}'.format)
+    for bank_row, description, amount, date, card_type, expected in matched_df.itertuples(name=None):
+        print(f"  Row {bank_row}: {description} - {amount}")
+        print(f"    → Matched from Card Summary: {date} {card_type} {expected}")
     
     print("\n🔴 UNMATCHED TRANSACTIONS (Red highlighting):")
     print("Comments show what they tried to match FROM the card summary:")
-    for bank_row, details in unmatched_transactions.items():
-        print(f"  Row {bank_row}: {details['Description']} - ${details['Amount']:,.2f}")
-        print(f"    → Tried to match from Card Summary: {details.get('Date', 'Unknown')} {details.get('Card_Type', 'Unknown')} ${details.get('expected', 0):,.2f}")
-        print(f"    → Reason: {details.get('reason', 'Unknown')}")
+    unmatched_df = details_frame(unmatched_transactions, {
+        'Description': '', 'Amount': 0, 'Date': 'Unknown', 'Card_Type': 'Unknown', 'expected': 0, 'reason': 'Unknown'
+    })
+    unmatched_df['Amount'] = unmatched_df['Amount'].map('${:,.2f}'.format)
+    unmatched_df['expected'] = unmatched_df['expected'].map('${:,.2f}'.format)
+    for bank_row, description, amount, date, card_type, expected, reason in unmatched_df.itertuples(name=None):
+        print(f"  Row {bank_row}: {description} - {amount}")
+        print(f"    → Tried to match from Card Summary: {date} {card_type} {expected}")
+        print(f"    → Reason: {reason}")
     
     print("\n🔵 GC TRANSACTIONS (Blue highlighting):")
     print("Comments show what they matched FROM the deposit slip:")
-    for bank_row, details in gc_transactions.items():
-        print(f"  Row {bank_row}: {details['Description']} - ${details['Amount']:,.2f}")
-        print(f"    → Matched from Deposit Slip: {details.get('Date', 'Unknown')} GC (Cash & Check) ${details.get('Amount', 0):,.2f}")
+    gc_df = details_frame(gc_transactions, {'Description': '', 'Amount': 0, 'Date': 'Unknown'})
+    gc_df['Amount'] = gc_df['Amount'].map('${:,.2f}'.format)
+    for bank_row, description, amount, date in gc_df.itertuples(name=None):
+        print(f"  Row {bank_row}: {description} - {amount}")
+        print(f"    → Matched from Deposit Slip: {date} GC (Cash & Check) {amount}")
     
     print(f"\n=== Instructions ===")
     print(f"1. Open the file '{output_path}' in Excel")
@@ -4,12 +4,78 @@ One script to rule them all - automatically detects and processes all reconcilia
 """
 
 import os
+import re
 import sys
-import glob
+import fnmatch
+import functools
+import importlib
 import pandas as pd
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 import argparse
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+def compile_patterns(patterns: List[str]) -> re.Pattern:
+    """
+    Combine filename wildcard patterns into one case-sensitive regex (like glob).
+    Each pattern is wrapped in its own named group, so match.lastgroup tells which one matched.
+    """
+    return re.compile('|'.join(f'(?P<p{rank}>{fnmatch.translate(pattern)})'
+                               for rank, pattern in enumerate(patterns)))
+
+def _match_rank(pattern: re.Pattern, name: str) -> Optional[int]:
+    """Return the index of the first wildcard pattern matching name, or None if none match."""
+    # Named groups rather than lastindex: fnmatch.translate adds groups of its own before Python 3.11
+    match = pattern.match(name)
+    return int(match.lastgroup[1:]) if match else None
+
+def scan_for_files(directory: str, patterns: Dict[str, re.Pattern]) -> Dict:
+    """
+    Classify the reconciliation files in a directory in a single scandir pass.
+    
+    Files matching an earlier pattern win, then files earlier in directory order,
+    just like calling glob once per pattern. A missing directory has no files.
+    """
+    bank_matches = []
+    best = {}
+    with os.scandir(directory) if os.path.isdir(directory) else nullcontext(()) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith('.'):
+                # Hidden files are skipped like glob does
+                continue
+            
+            ranks = {file_type: _match_rank(pattern, name) for file_type, pattern in patterns.items()}
+            if 'discover' in name.lower():
+                # Discover is never treated as a main bank statement
+                ranks['bank_statements'] = None
+            ranks = {file_type: rank for file_type, rank in ranks.items() if rank is not None}
+            # Only names that match a pattern pay for the is_file() check
+            if not ranks or not entry.is_file():
+                continue
+            
+            for file_type, rank in ranks.items():
+                if file_type == 'bank_statements':
+                    bank_matches.append((rank, entry.path))
+                elif file_type not in best or rank < best[file_type][0]:
+                    best[file_type] = (rank, entry.path)
+    
+    detected = {
+        # Stable sort: equally ranked statements stay in directory order
+        'bank_statements': [path for _, path in sorted(bank_matches, key=lambda match: match[0])],
+        'card_summary': None,
+        'deposit_slip': None,
+        'discover_statement': None
+    }
+    for file_type, (_, path) in best.items():
+        detected[file_type] = path
+    return detected
+
+@functools.lru_cache(maxsize=None)
+def _lazy_import(module_name: str):
+    """Import a processing module the first time a reconciliation needs it."""
+    return importlib.import_module(module_name)
 
 class UltraMasterReconciliation:
     """
@@ -17,76 +83,68 @@ class UltraMasterReconciliation:
     Handles: single bank, multi-bank, deposits, and all combinations.
     """
     
-    def __init__(self, auto_detect: bool = True, verbose: bool = False):
+    # Filename patterns for each file type, in priority order
+    _PATTERNS = {
+        'bank_statements': compile_patterns(['*bank*statement*.csv', '*bank*statement*.CSV',
+                                              '*statement*.csv', '*statement*.CSV']),
+        'card_summary': compile_patterns(['*card*summary*.xlsx', '*credit*card*.xlsx',
+                                           '*CreditCard*.xlsx', '*CardSummary*.xlsx']),
+        'deposit_slip': compile_patterns([
+            # '*deposit*.xlsx', '*Deposit*.xlsx',
+            '*MonthlyDeposit*.xlsx'
+        ]),
+        'discover_statement': compile_patterns(['*discover*.csv', '*discover*.CSV',
+                                                 '*Discover*.csv', '*Discover*.CSV'])
+    }
+    
+    def __init__(self, auto_detect: bool = True, verbose: bool = False, parallel: bool = True):
         self.auto_detect = auto_detect
         self.verbose = verbose
-        self.detected_files = {}
+        self.parallel = parallel
+        self._detected_files = {}
+        self._detected_directory = None
+        self.processing_mode = None
+    
+    @property
+    def detected_files(self) -> Dict:
+        return self._detected_files
+    
+    @detected_files.setter
+    def detected_files(self, files: Dict):
+        # New files invalidate the cached detection and processing mode
+        self._detected_files = files
+        self._detected_directory = None
         self.processing_mode = None
         
-    def detect_files(self, directory: str = '.') -> Dict:
+    def detect_files(self, directory: str = '.', force: bool = False) -> Dict:
         """
-        Automatically detect reconciliation files in the directory.
+        Automatically detect reconciliation files in the directory (a str or Path).
+        The result is cached per directory; pass force=True to rescan.
         """
-        print("🔍 Auto-detecting files...")
+        directory = os.fspath(directory)
+        if not force and self._detected_files and self._detected_directory == directory:
+            return self._detected_files
         
-        detected = {
-            'bank_statements': [],
-            'card_summary': None,
-            'deposit_slip': None,
-            'discover_statement': None
-        }
-        
-        # Common patterns for each file type
-        patterns = {
-            'bank_statements': [
-                '*bank*statement*.csv', '*bank*statement*.CSV',
-                '*statement*.csv', '*statement*.CSV'
-            ],
-            'card_summary': [
-                '*card*summary*.xlsx', '*credit*card*.xlsx',
-                '*CreditCard*.xlsx', '*CardSummary*.xlsx'
-            ],
-            'deposit_slip': [
-                # '*deposit*.xlsx', '*Deposit*.xlsx',
-                '*MonthlyDeposit*.xlsx'
-            ],
-            'discover_statement': [
-                '*discover*.csv', '*discover*.CSV',
-                '*Discover*.csv', '*Discover*.CSV'
-            ]
-        }
+        print("🔍 Auto-detecting files...")
         
-        # Search for files
-        for file_type, file_patterns in patterns.items():
-            for pattern in file_patterns:
-                matches = glob.glob(os.path.join(directory, pattern))
-                
-                if file_type == 'bank_statements':
-                    # Exclude Discover from main bank statements
-                    for match in matches:
-                        if 'discover' not in match.lower():
-                            detected['bank_statements'].append(match)
-                elif file_type == 'discover_statement':
-                    if matches and not detected['discover_statement']:
-                        detected['discover_statement'] = matches[0]
-                elif file_type == 'card_summary':
-                    if matches and not detected['card_summary']:
-                        # Pick the most recent or first match
-                        detected['card_summary'] = matches[0]
-                elif file_type == 'deposit_slip':
-                    if matches and not detected['deposit_slip']:
-                        detected['deposit_slip'] = matches[0]
-        
-        # Clean up bank statements list
-        if detected['discover_statement'] in detected['bank_statements']:
-            detected['bank_statements'].remove(detected['discover_statement'])
+        detected = scan_for_files(directory, self._PATTERNS)
         
         self.detected_files = detected
+        self._detected_directory = directory
         return detected
     
     def determine_processing_mode(self) -> str:
         """
         Determine which processing mode to use based on detected files.
+        The mode is cached until the detected files change.
+        """
+        if self.processing_mode is None:
+            self.processing_mode = self._compute_processing_mode()
+        return self.processing_mode
+    
+    def _compute_processing_mode(self) -> str:
+        """
+        Work out the processing mode from the detected files (uncached).
         """
         modes = []
         
@@ -150,7 +208,6 @@ class UltraMasterReconciliation:
             print("  ✗ Deposit Slip: Not found")
         
         mode = self.determine_processing_mode()
-        self.processing_mode = mode
         
         print(f"\n🎯 Processing Mode: {mode.replace('_', ' ').title()}")
         
@@ -177,7 +234,7 @@ class UltraMasterReconciliation:
         Run the appropriate reconciliation based on detected files or forced mode.
         """
         # Use forced mode if provided, otherwise use detected mode
-        mode = force_mode or self.processing_mode
+        mode = force_mode or (self.determine_processing_mode() if self.detected_files else None)
         
         if not mode or mode == 'insufficient_files':
             print("\n❌ Cannot proceed - insufficient files detected")
@@ -188,19 +245,11 @@ class UltraMasterReconciliation:
         print("="*60)
         
         # Route to appropriate processor
-        if mode == 'full_multi_bank_with_deposits':
-            return self._run_full_multi_bank_with_deposits(output_dir)
-        elif mode == 'full_single_bank_with_deposits':
-            return self._run_full_single_bank_with_deposits(output_dir)
-        elif mode == 'multi_bank_cards_only':
-            return self._run_multi_bank_cards(output_dir)
-        elif mode == 'single_bank_cards_only':
-            return self._run_single_bank_cards(output_dir)
-        elif mode == 'deposits_only':
-            return self._run_deposits_only(output_dir)
-        else:
+        handler = self._DISPATCH.get(mode)
+        if handler is None:
             print(f"❌ Unknown processing mode: {mode}")
             return None
+        return handler(self, output_dir)
     
     def _run_full_multi_bank_with_deposits(self, output_dir: str):
         """
@@ -208,27 +257,37 @@ class UltraMasterReconciliation:
         """
         print("\n🏦 Processing Multiple Banks with Deposits...")
         
-        # First run multi-bank card matching
-        from multi_bank_processor import process_with_multiple_bank_statements
+        process_with_multiple_bank_statements = _lazy_import('multi_bank_processor').process_with_multiple_bank_statements
+        process_deposit_slip = _lazy_import('deposit_matching').process_deposit_slip
         
-        card_results = process_with_multiple_bank_statements(
+        card_job = functools.partial(
+            process_with_multiple_bank_statements,
             main_bank_statement_path=self.detected_files['bank_statements'][0],
             discover_bank_statement_path=self.detected_files['discover_statement'],
             card_summary_path=self.detected_files['card_summary'],
             output_dir=output_dir,
             verbose=self.verbose
         )
-        
-        # Then run deposit matching on main bank
-        from deposit_matching import process_deposit_slip
-        
-        deposit_results = process_deposit_slip(
+        deposit_job = functools.partial(
+            process_deposit_slip,
             deposit_slip_path=self.detected_files['deposit_slip'],
             bank_statement_path=self.detected_files['bank_statements'][0],
             output_dir=output_dir,
             verbose=self.verbose
         )
         
+        if self.parallel:
+            # Card matching and deposit matching read different files and write different
+            # outputs, so run them side by side
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                card_future = executor.submit(card_job)
+                deposit_future = executor.submit(deposit_job)
+                card_results = card_future.result()
+                deposit_results = deposit_future.result()
+        else:
+            card_results = card_job()
+            deposit_results = deposit_job()
+        
         # Create combined summary
         self._create_combined_summary(card_results, deposit_results, output_dir)
         
@@ -240,7 +299,7 @@ class UltraMasterReconciliation:
         """
         print("\n🏦 Processing Single Bank with Deposits...")
         
-        from main_with_deposits import run_combined_analysis
+        run_combined_analysis = _lazy_import('main_with_deposits').run_combined_analysis
         
         return run_combined_analysis(
             card_summary_path=self.detected_files['card_summary'],
@@ -255,7 +314,7 @@ class UltraMasterReconciliation:
         Run multi-bank card reconciliation only.
         """
         
-        from multi_bank_processor import process_with_multiple_bank_statements
+        process_with_multiple_bank_statements = _lazy_import('multi_bank_processor').process_with_multiple_bank_statements
         
         return process_with_multiple_bank_statements(
             main_bank_statement_path=self.detected_files['bank_statements'][0],
@@ -271,7 +330,7 @@ class UltraMasterReconciliation:
         """
         print("\n💳 Processing Single Bank Card Reconciliation...")
         
-        from main_with_deposits import run_card_matching
+        run_card_matching = _lazy_import('main_with_deposits').run_card_matching
         
         return run_card_matching(
             card_summary_path=self.detected_files['card_summary'],
@@ -286,7 +345,7 @@ class UltraMasterReconciliation:
         """
         print("\n💰 Processing Deposit Reconciliation...")
         
-        from deposit_matching import process_deposit_slip
+        process_deposit_slip = _lazy_import('deposit_matching').process_deposit_slip
         
         return process_deposit_slip(
             deposit_slip_path=self.detected_files['deposit_slip'],
@@ -295,41 +354,80 @@ class UltraMasterReconciliation:
             verbose=self.verbose
         )
     
+    # Processing mode -> handler
+    _DISPATCH = {
+        'full_multi_bank_with_deposits': _run_full_multi_bank_with_deposits,
+        'full_single_bank_with_deposits': _run_full_single_bank_with_deposits,
+        'multi_bank_cards_only': _run_multi_bank_cards,
+        'single_bank_cards_only': _run_single_bank_cards,
+        'deposits_only': _run_deposits_only
+    }
+    
     def _create_combined_summary(self, card_results, deposit_results, output_dir: str):
         """
         Create a combined summary report for all reconciliation types.
         """
         summary_path = os.path.join(output_dir, 'MASTER_RECONCILIATION_SUMMARY.txt')
         
+        # One line per detected file; bank statements are a list, the rest single paths
+        file_lines = [
+            f"  - {file_type}: {fp}\n"
+            for file_type, file_path in self.detected_files.items() if file_path
+            for fp in (file_path if isinstance(file_path, list) else [file_path])
+        ]
+        
+        parts = [
+            "="*70 + "\n",
+            "MASTER RECONCILIATION SUMMARY\n",
+            f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+            "="*70 + "\n\n",
+            "FILES PROCESSED:\n",
+            *file_lines,
+            "\n" + "-"*70 + "\n",
+            "PROCESSING MODE: " + self.processing_mode.replace('_', ' ').title() + "\n",
+            "-"*70 + "\n\n",
+            "RESULTS SUMMARY:\n",
+            "  ✓ Credit Card Reconciliation: Complete\n"
+        ]
+        if deposit_results:
+            parts.append("  ✓ Deposit Reconciliation: Complete\n")
+        parts += [
+            "\nGENERATED OUTPUT FILES:\n",
+            "  - See output directory for all highlighted files and reports\n"
+        ]
+        
         with open(summary_path, 'w') as f:
-            f.write("="*70 + "\n")
-            f.write("MASTER RECONCILIATION SUMMARY\n")
-            f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("="*70 + "\n\n")
-            
-            f.write("FILES PROCESSED:\n")
-            for file_type, file_path in self.detected_files.items():
-                if file_path:
-                    if isinstance(file_path, list):
-                        for fp in file_path:
-                            f.write(f"  - {file_type}: {fp}\n")
-                    else:
-                        f.write(f"  - {file_type}: {file_path}\n")
-            
-            f.write("\n" + "-"*70 + "\n")
-            f.write("PROCESSING MODE: " + self.processing_mode.replace('_', ' ').title() + "\n")
-            f.write("-"*70 + "\n\n")
-            
-            f.write("RESULTS SUMMARY:\n")
-            f.write("  ✓ Credit Card Reconciliation: Complete\n")
-            if deposit_results:
-                f.write("  ✓ Deposit Reconciliation: Complete\n")
-            
-            f.write("\nGENERATED OUTPUT FILES:\n")
-            f.write("  - See output directory for all highlighted files and reports\n")
+            f.write(''.join(parts))
             
         print(f"\n✅ Master summary created: {summary_path}")
 
+def wait_for_start(timeout: float):
+    """
+    Wait up to timeout seconds before starting, returning as soon as Enter is pressed.
+    """
+    import time
+    
+    if sys.stdin is None or sys.stdin.closed:
+        # No console to read Enter from (pythonw, or stdin closed): just wait
+        time.sleep(timeout)
+        return
+    
+    if os.name == 'nt':
+        import msvcrt
+        
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if msvcrt.kbhit() and msvcrt.getwch() in '\r\n':
+                return
+            time.sleep(0.05)
+        return
+    
+    import select
+    
+    ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    if ready:
+        sys.stdin.readline()
+
 def main():
     """
     Main entry point with command line interface.
@@ -362,6 +460,9 @@ Examples:
     parser.add_argument('--output', default='.', help='Output directory')
     parser.add_argument('--verbose', action='store_true', help='Verbose output')
     parser.add_argument('--mode', help='Force specific processing mode')
+    parser.add_argument('--parallel', action=argparse.BooleanOptionalAction, default=True,
+                       help='Run card and deposit matching at the same time in full multi-bank mode; '
+                            'their progress output interleaves, use --no-parallel for readable logs (default: on)')
     
     args = parser.parse_args()
     
@@ -371,7 +472,7 @@ Examples:
     print("🚀"*30 + "\n")
     
     # Create reconciliation instance
-    reconciler = UltraMasterReconciliation(auto_detect=True, verbose=args.verbose)
+    reconciler = UltraMasterReconciliation(auto_detect=True, verbose=args.verbose, parallel=args.parallel)
     
     # Manual file specification overrides auto-detection
     if args.bank or args.cards or args.deposits or args.discover:
@@ -429,11 +530,10 @@ if __name__ == "__main__":
         if mode != 'insufficient_files':
             print("\n" + "="*60)
             print("🚀 Starting automatic reconciliation in 3 seconds...")
-            print("   (Press Ctrl+C to cancel)")
+            print("   (Press Enter to start now, or Ctrl+C to cancel)")
             print("="*60)
             
-            import time
-            time.sleep(3)
+            wait_for_start(3)
             
             results = reconciler.run_reconciliation('.')
             
@@ -8,24 +8,67 @@ Handles complex edge cases:
 
 import os
 import sys
-import glob
-import pandas as pd
-from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from ultra_master import compile_patterns, scan_for_files, wait_for_start
+
+def _run_pair_parallel(card_fn, deposit_fn, parallel: bool = True):
+    """
+    Run the card and deposit matching jobs and return (card_results, deposit_results).
+    
+    With parallel set, each job runs in its own worker process; both are pandas/openpyxl
+    heavy, so threads would mostly wait on the GIL. The jobs must be picklable
+    (module-level functions or partials of them).
+    """
+    if not parallel:
+        return card_fn(), deposit_fn()
+    
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        card_future = executor.submit(card_fn)
+        deposit_future = executor.submit(deposit_fn)
+        return card_future.result(), deposit_future.result()
+
+# Processing mode for every combination of detected files, indexed by the bitmask
+# main bank (8) | discover (4) | card summary (2) | deposit slip (1).
+# Nothing can be reconciled without a main bank statement, and a Discover
+# statement on its own adds nothing without a card summary.
+_MODE_TABLE = (
+    *['insufficient_files'] * 8,          # 0-7: no main bank statement
+    'insufficient_files',                 # 8: bank only
+    'deposits_only',                      # 9: bank + deposits
+    'single_bank_cards_only',             # 10: bank + cards
+    'full_single_bank_with_deposits',     # 11: bank + cards + deposits
+    'insufficient_files',                 # 12: bank + discover
+    'deposits_only',                      # 13: bank + discover + deposits
+    'multi_bank_cards_only',              # 14: bank + discover + cards
+    'full_multi_bank_with_deposits'       # 15: everything
+)
 
 class UltraMasterReconciliationEnhanced:
     """
     Enhanced unified reconciliation system with advanced edge case handling.
     """
     
+    # Filename patterns for each file type, in priority order
+    _PATTERNS = {
+        'bank_statements': compile_patterns(['*bank*statement*.csv', '*bank*statement*.CSV',
+                                             '*statement*.csv', '*statement*.CSV']),
+        'card_summary': compile_patterns(['*card*summary*.xlsx', '*credit*card*.xlsx',
+                                          '*CreditCard*.xlsx', '*CardSummary*.xlsx']),
+        'deposit_slip': compile_patterns(['*deposit*.xlsx', '*Deposit*.xlsx', '*MonthlyDeposit*.xlsx']),
+        'discover_statement': compile_patterns(['*discover*.csv', '*discover*.CSV',
+                                                '*Discover*.csv', '*Discover*.CSV'])
+    }
+    
     def __init__(self, auto_detect: bool = True, verbose: bool = False, 
                  enable_discover_backward: bool = True):
         self.auto_detect = auto_detect
         self.verbose = verbose
         self.enable_discover_backward = enable_discover_backward
         self.detected_files = {}
-        self.processing_mode = None
+        self._bank_statement_cache = {}
         
         # Configuration for special handling
         self.config = {
@@ -33,101 +76,70 @@ class UltraMasterReconciliationEnhanced:
             'discover_forward_days': 3,
             'discover_backward_enabled': enable_discover_backward,
             'deposit_forward_days': 3,
-            'enable_flexible_deposit_matching': True
+            'enable_flexible_deposit_matching': True,
+            'parallel': True,
+            'fast_excel': False
         }
         
+    @property
+    def detected_files(self) -> Dict:
+        return self._detected_files
+    
+    @detected_files.setter
+    def detected_files(self, files: Dict):
+        # New files invalidate the cached processing mode and detection report
+        self._detected_files = files
+        self.processing_mode = None
+        self._detection_report_lines = None
+    
     def detect_files(self, directory: str = '.') -> Dict:
         """
         Automatically detect reconciliation files in the directory.
         """
         print("🔍 Auto-detecting files...")
         
-        detected = {
-            'bank_statements': [],
-            'card_summary': None,
-            'deposit_slip': None,
-            'discover_statement': None
-        }
-        
-        # Common patterns for each file type
-        patterns = {
-            'bank_statements': [
-                '*bank*statement*.csv', '*bank*statement*.CSV',
-                '*statement*.csv', '*statement*.CSV'
-            ],
-            'card_summary': [
-                '*card*summary*.xlsx', '*credit*card*.xlsx',
-                '*CreditCard*.xlsx', '*CardSummary*.xlsx'
-            ],
-            'deposit_slip': [
-                '*deposit*.xlsx', '*Deposit*.xlsx',
-                '*MonthlyDeposit*.xlsx'
-            ],
-            'discover_statement': [
-                '*discover*.csv', '*discover*.CSV',
-                '*Discover*.csv', '*Discover*.CSV'
-            ]
-        }
-        
-        # Search for files
-        for file_type, file_patterns in patterns.items():
-            for pattern in file_patterns:
-                matches = glob.glob(os.path.join(directory, pattern))
-                
-                if file_type == 'bank_statements':
-                    for match in matches:
-                        if 'discover' not in match.lower():
-                            detected['bank_statements'].append(match)
-                elif file_type == 'discover_statement':
-                    if matches and not detected['discover_statement']:
-                        detected['discover_statement'] = matches[0]
-                elif file_type == 'card_summary':
-                    if matches and not detected['card_summary']:
-                        detected['card_summary'] = matches[0]
-                elif file_type == 'deposit_slip':
-                    if matches and not detected['deposit_slip']:
-                        detected['deposit_slip'] = matches[0]
-        
-        # Clean up bank statements list
-        if detected['discover_statement'] in detected['bank_statements']:
-            detected['bank_statements'].remove(detected['discover_statement'])
+        detected = scan_for_files(directory, self._PATTERNS)
         
         self.detected_files = detected
+        self._detection_report_lines = self._build_detection_report(detected)
         return detected
     
+    @staticmethod
+    def _build_detection_report(detected: Dict) -> List[str]:
+        """
+        Build the "✓/✗" lines of the detection summary for the given files.
+        """
+        main_bank = detected['bank_statements'][0] if detected['bank_statements'] else None
+        return [
+            f"  ✓ {label}: {path}" if path else f"  ✗ {label}: Not found"
+            for label, path in (
+                ('Main Bank Statement', main_bank),
+                ('Discover Statement', detected['discover_statement']),
+                ('Card Summary', detected['card_summary']),
+                ('Deposit Slip', detected['deposit_slip'])
+            )
+        ]
+    
     def determine_processing_mode(self) -> str:
         """
         Determine which processing mode to use based on detected files.
+        The mode is cached until detected_files is replaced.
+        """
+        if self.processing_mode is None:
+            self.processing_mode = self._compute_processing_mode()
+        return self.processing_mode
+    
+    def _compute_processing_mode(self) -> str:
+        """
+        Look up the processing mode for the detected files (uncached).
         """
         has_main_bank = len(self.detected_files['bank_statements']) > 0
         has_discover = self.detected_files['discover_statement'] is not None
         has_cards = self.detected_files['card_summary'] is not None
         has_deposits = self.detected_files['deposit_slip'] is not None
         
-        modes = []
-        
-        # Determine mode
-        if has_main_bank and has_discover and has_cards:
-            modes.append('multi_bank_cards')
-        elif has_main_bank and has_cards:
-            modes.append('single_bank_cards')
-        
-        if has_main_bank and has_deposits:
-            modes.append('deposits')
-        
-        # Combine modes
-        if 'multi_bank_cards' in modes and 'deposits' in modes:
-            return 'full_multi_bank_with_deposits'
-        elif 'single_bank_cards' in modes and 'deposits' in modes:
-            return 'full_single_bank_with_deposits'
-        elif 'multi_bank_cards' in modes:
-            return 'multi_bank_cards_only'
-        elif 'single_bank_cards' in modes:
-            return 'single_bank_cards_only'
-        elif 'deposits' in modes:
-            return 'deposits_only'
-        else:
-            return 'insufficient_files'
+        key = (has_main_bank << 3) | (has_discover << 2) | (has_cards << 1) | has_deposits
+        return _MODE_TABLE[key]
     
     def print_detection_summary(self):
         """
@@ -139,28 +151,12 @@ class UltraMasterReconciliationEnhanced:
         
         print("\n📁 Detected Files:")
         
-        if self.detected_files['bank_statements']:
-            print(f"  ✓ Main Bank Statement: {self.detected_files['bank_statements'][0]}")
-        else:
-            print("  ✗ Main Bank Statement: Not found")
-        
-        if self.detected_files['discover_statement']:
-            print(f"  ✓ Discover Statement: {self.detected_files['discover_statement']}")
-        else:
-            print("  ✗ Discover Statement: Not found")
-        
-        if self.detected_files['card_summary']:
-            print(f"  ✓ Card Summary: {self.detected_files['card_summary']}")
-        else:
-            print("  ✗ Card Summary: Not found")
-        
-        if self.detected_files['deposit_slip']:
-            print(f"  ✓ Deposit Slip: {self.detected_files['deposit_slip']}")
-        else:
-            print("  ✗ Deposit Slip: Not found")
+        # Manually assigned files have no report from detect_files yet
+        if self._detection_report_lines is None:
+            self._detection_report_lines = self._build_detection_report(self.detected_files)
+        print('\n'.join(self._detection_report_lines))
         
         mode = self.determine_processing_mode()
-        self.processing_mode = mode
         
         print(f"\n🎯 Processing Mode: {mode.replace('_', ' ').title()}")
         
@@ -183,7 +179,7 @@ class UltraMasterReconciliationEnhanced:
         """
         Run the appropriate reconciliation based on detected files or forced mode.
         """
-        mode = force_mode or self.processing_mode
+        mode = force_mode or (self.determine_processing_mode() if self.detected_files else None)
         
         if not mode or mode == 'insufficient_files':
             print("\n❌ Cannot proceed - insufficient files detected")
@@ -208,34 +204,56 @@ class UltraMasterReconciliationEnhanced:
             print(f"❌ Unknown processing mode: {mode}")
             return None
     
+    def _load_bank_statement_cached(self, path: str):
+        """
+        Preprocess a bank statement once per (path, modification time, size) so both
+        matchers in a full run share one parsed DataFrame. The matchers work on copies.
+        """
+        from preprocess_bank_statement import preprocess_bank_statement
+        
+        key = (path, os.path.getmtime(path), os.path.getsize(path))
+        if key not in self._bank_statement_cache:
+            self._bank_statement_cache[key] = preprocess_bank_statement(path)
+        return self._bank_statement_cache[key]
+    
     def _run_full_multi_bank_with_deposits_enhanced(self, output_dir: str):
         """
         Run complete reconciliation with multiple banks and enhanced deposit matching.
         """
         print("\n🏦 Processing Multiple Banks with Enhanced Deposits...")
         
-        # First run enhanced multi-bank card matching
         from enhanced_multi_bank import process_with_enhanced_multi_bank
-        
-        card_results = process_with_enhanced_multi_bank(
-            main_bank_statement_path=self.detected_files['bank_statements'][0],
-            discover_bank_statement_path=self.detected_files['discover_statement'],
-            card_summary_path=self.detected_files['card_summary'],
-            output_dir=output_dir,
-            enable_discover_backward_matching=self.config['discover_backward_enabled'],
-            discover_backward_days=self.config['discover_backward_days'],
-            discover_forward_days=self.config['discover_forward_days'],
-            verbose=self.verbose
-        )
-        
-        # Then run enhanced deposit matching on main bank
         from enhanced_deposit_matching import process_deposit_slip_enhanced
         
-        deposit_results = process_deposit_slip_enhanced(
-            deposit_slip_path=self.detected_files['deposit_slip'],
-            bank_statement_path=self.detected_files['bank_statements'][0],
-            output_dir=output_dir,
-            verbose=self.verbose
+        # Parse the main bank statement once for both matchers
+        bank_df = self._load_bank_statement_cached(self.detected_files['bank_statements'][0])
+        
+        # Enhanced multi-bank card matching and enhanced deposit matching on the main bank
+        # are independent, so they run side by side unless parallel processing is disabled
+        card_results, deposit_results = _run_pair_parallel(
+            partial(
+                process_with_enhanced_multi_bank,
+                main_bank_statement_path=self.detected_files['bank_statements'][0],
+                discover_bank_statement_path=self.detected_files['discover_statement'],
+                card_summary_path=self.detected_files['card_summary'],
+                output_dir=output_dir,
+                enable_discover_backward_matching=self.config['discover_backward_enabled'],
+                discover_backward_days=self.config['discover_backward_days'],
+                discover_forward_days=self.config['discover_forward_days'],
+                verbose=self.verbose,
+                bank_df=bank_df,
+                fast_excel=self.config['fast_excel']
+            ),
+            partial(
+                process_deposit_slip_enhanced,
+                deposit_slip_path=self.detected_files['deposit_slip'],
+                bank_statement_path=self.detected_files['bank_statements'][0],
+                output_dir=output_dir,
+                verbose=self.verbose,
+                bank_df=bank_df,
+                fast_excel=self.config['fast_excel']
+            ),
+            parallel=self.config['parallel']
         )
         
         self._create_enhanced_summary(card_results, deposit_results, output_dir)
@@ -248,24 +266,33 @@ class UltraMasterReconciliationEnhanced:
         """
         print("\n🏦 Processing Single Bank with Enhanced Deposits...")
         
-        # Run standard card matching
         from main_with_deposits import run_card_matching
-        
-        card_results = run_card_matching(
-            card_summary_path=self.detected_files['card_summary'],
-            bank_statement_path=self.detected_files['bank_statements'][0],
-            output_dir=output_dir,
-            verbose=self.verbose
-        )
-        
-        # Run enhanced deposit matching
         from enhanced_deposit_matching import process_deposit_slip_enhanced
         
-        deposit_results = process_deposit_slip_enhanced(
-            deposit_slip_path=self.detected_files['deposit_slip'],
-            bank_statement_path=self.detected_files['bank_statements'][0],
-            output_dir=output_dir,
-            verbose=self.verbose
+        # Parse the bank statement once for both matchers
+        bank_df = self._load_bank_statement_cached(self.detected_files['bank_statements'][0])
+        
+        # Standard card matching and enhanced deposit matching are independent
+        card_results, deposit_results = _run_pair_parallel(
+            partial(
+                run_card_matching,
+                card_summary_path=self.detected_files['card_summary'],
+                bank_statement_path=self.detected_files['bank_statements'][0],
+                output_dir=output_dir,
+                verbose=self.verbose,
+                bank_df=bank_df,
+                fast_excel=self.config['fast_excel']
+            ),
+            partial(
+                process_deposit_slip_enhanced,
+                deposit_slip_path=self.detected_files['deposit_slip'],
+                bank_statement_path=self.detected_files['bank_statements'][0],
+                output_dir=output_dir,
+                verbose=self.verbose,
+                bank_df=bank_df,
+                fast_excel=self.config['fast_excel']
+            ),
+            parallel=self.config['parallel']
         )
         
         self._create_enhanced_summary(card_results, deposit_results, output_dir)
@@ -286,7 +313,8 @@ class UltraMasterReconciliationEnhanced:
             enable_discover_backward_matching=self.config['discover_backward_enabled'],
             discover_backward_days=self.config['discover_backward_days'],
             discover_forward_days=self.config['discover_forward_days'],
-            verbose=self.verbose
+            verbose=self.verbose,
+            fast_excel=self.config['fast_excel']
         )
     
     def _run_single_bank_cards(self, output_dir: str):
@@ -301,7 +329,8 @@ class UltraMasterReconciliationEnhanced:
             card_summary_path=self.detected_files['card_summary'],
             bank_statement_path=self.detected_files['bank_statements'][0],
             output_dir=output_dir,
-            verbose=self.verbose
+            verbose=self.verbose,
+            fast_excel=self.config['fast_excel']
         )
     
     def _run_deposits_only_enhanced(self, output_dir: str):
@@ -316,49 +345,50 @@ class UltraMasterReconciliationEnhanced:
             deposit_slip_path=self.detected_files['deposit_slip'],
             bank_statement_path=self.detected_files['bank_statements'][0],
             output_dir=output_dir,
-            verbose=self.verbose
+            verbose=self.verbose,
+            fast_excel=self.config['fast_excel']
         )
     
     def _create_enhanced_summary(self, card_results, deposit_results, output_dir: str):
         """
         Create an enhanced combined summary report.
         """
+        from datetime import datetime
+        
         summary_path = os.path.join(output_dir, 'MASTER_RECONCILIATION_ENHANCED_SUMMARY.txt')
         
-        with open(summary_path, 'w') as f:
-            f.write("="*70 + "\n")
-            f.write("ENHANCED MASTER RECONCILIATION SUMMARY\n")
-            f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("="*70 + "\n\n")
-            
-            f.write("SPECIAL FEATURES ENABLED:\n")
-            if self.config['discover_backward_enabled']:
-                f.write(f"  ✓ Discover backward date matching ({self.config['discover_backward_days']} days)\n")
-            if self.config['enable_flexible_deposit_matching']:
-                f.write("  ✓ Flexible deposit matching (single GC 1416 splitting)\n")
-                f.write("  ✓ Multi-transaction aggregation for deposits\n")
-            
-            f.write("\nFILES PROCESSED:\n")
-            for file_type, file_path in self.detected_files.items():
-                if file_path:
-                    if isinstance(file_path, list):
-                        for fp in file_path:
-                            f.write(f"  - {file_type}: {fp}\n")
-                    else:
-                        f.write(f"  - {file_type}: {file_path}\n")
-            
-            f.write("\n" + "-"*70 + "\n")
-            f.write("PROCESSING MODE: " + self.processing_mode.replace('_', ' ').title() + "\n")
-            f.write("-"*70 + "\n\n")
-            
-            f.write("RESULTS SUMMARY:\n")
-            f.write("  ✓ Credit Card Reconciliation: Complete\n")
-            if deposit_results:
-                f.write("  ✓ Deposit Reconciliation: Complete (Enhanced)\n")
-            
-            f.write("\nGENERATED OUTPUT FILES:\n")
-            f.write("  - All highlighted Excel files with enhanced matching\n")
-            f.write("  - Check color coding for special match types\n")
+        lines = [f"{'='*70}\nENHANCED MASTER RECONCILIATION SUMMARY\n"
+                 f"Generated: {datetime.now():%Y-%m-%d %H:%M:%S}\n{'='*70}\n\n"]
+        
+        lines.append("SPECIAL FEATURES ENABLED:\n")
+        if self.config['discover_backward_enabled']:
+            lines.append(f"  ✓ Discover backward date matching ({self.config['discover_backward_days']} days)\n")
+        if self.config['enable_flexible_deposit_matching']:
+            lines.append("  ✓ Flexible deposit matching (single GC 1416 splitting)\n")
+            lines.append("  ✓ Multi-transaction aggregation for deposits\n")
+        
+        lines.append("\nFILES PROCESSED:\n")
+        lines.extend(
+            f"  - {file_type}: {fp}\n"
+            for file_type, file_path in self.detected_files.items() if file_path
+            for fp in (file_path if isinstance(file_path, list) else [file_path])
+        )
+        
+        lines.append(f"\n{'-'*70}\n"
+                     f"PROCESSING MODE: {self.processing_mode.replace('_', ' ').title()}\n"
+                     f"{'-'*70}\n\n")
+        
+        lines.append("RESULTS SUMMARY:\n")
+        lines.append("  ✓ Credit Card Reconciliation: Complete\n")
+        if deposit_results:
+            lines.append("  ✓ Deposit Reconciliation: Complete (Enhanced)\n")
+        
+        lines.append("\nGENERATED OUTPUT FILES:\n")
+        lines.append("  - All highlighted Excel files with enhanced matching\n")
+        lines.append("  - Check color coding for special match types\n")
+        
+        with open(summary_path, 'w', buffering=1 << 16) as f:
+            f.writelines(lines)
             
         print(f"\n✅ Enhanced master summary created: {summary_path}")
 
@@ -387,6 +417,9 @@ Examples:
   
   # Verbose output for debugging
   python ultra_master_enhanced.py --verbose
+  
+  # Run without the confirmation prompt
+  python ultra_master_enhanced.py --yes
         """
     )
     
@@ -399,6 +432,8 @@ Examples:
     parser.add_argument('--output', default='.', help='Output directory')
     parser.add_argument('--verbose', action='store_true', help='Verbose output')
     parser.add_argument('--mode', help='Force specific processing mode')
+    parser.add_argument('--yes', '-y', action='store_true',
+                       help='Skip the confirmation prompt')
     
     # Enhanced feature toggles
     parser.add_argument('--no-discover-backward', action='store_true',
@@ -407,6 +442,12 @@ Examples:
                        help='Days to look backward for Discover (default: 3)')
     parser.add_argument('--discover-forward-days', type=int, default=3,
                        help='Days to look forward for Discover (default: 3)')
+    parser.add_argument('--parallel', action=argparse.BooleanOptionalAction, default=True,
+                       help='Run card and deposit matching in parallel processes (default: on)')
+    parser.add_argument('--fast-excel', action=argparse.BooleanOptionalAction, default=False,
+                       help='Write highlighted summaries through write-only workbooks; faster on large '
+                            'files, but only cell values and styles are kept - column widths, row heights, '
+                            'merged cells, other sheets and other formatting are dropped (default: off)')
     
     args = parser.parse_args()
     
@@ -427,6 +468,8 @@ Examples:
         reconciler.config['discover_backward_days'] = args.discover_backward_days
     if args.discover_forward_days:
         reconciler.config['discover_forward_days'] = args.discover_forward_days
+    reconciler.config['parallel'] = args.parallel
+    reconciler.config['fast_excel'] = args.fast_excel
     
     # Manual file specification overrides auto-detection
     if args.bank or args.cards or args.deposits or args.discover:
@@ -451,12 +494,15 @@ Examples:
         print("  2. Either a card summary or deposit slip Excel file")
         return
     
-    # Confirm before proceeding
+    # Confirm before proceeding, unless already confirmed: --yes, files named on the
+    # command line, or no terminal to ask (scripts, cron, CI)
     print("\n" + "="*60)
-    response = input("📋 Ready to proceed with ENHANCED matching? (Y/n): ").strip().lower()
-    if response and response != 'y':
-        print("Reconciliation cancelled.")
-        return
+    files_given = args.bank or args.cards or args.deposits or args.discover
+    if not (args.yes or files_given or not sys.stdin.isatty()):
+        response = input("📋 Ready to proceed with ENHANCED matching? (Y/n): ").strip().lower()
+        if response and response != 'y':
+            print("Reconciliation cancelled.")
+            return
     
     # Run reconciliation
     results = reconciler.run_reconciliation(args.output, args.mode)
@@ -490,11 +536,10 @@ if __name__ == "__main__":
         if mode != 'insufficient_files':
             print("\n" + "="*60)
             print("🚀 Starting ENHANCED automatic reconciliation in 3 seconds...")
-            print("   (Press Ctrl+C to cancel)")
+            print("   (Press Enter to start now, or Ctrl+C to cancel)")
             print("="*60)
             
-            import time
-            time.sleep(3)
+            wait_for_start(3)
             
             results = reconciler.run_reconciliation('.')
             